@@ -1,12 +1,19 @@
+import sys
+from pathlib import Path
 from shiny import App, ui, render, reactive
-import pandas as pd
 import faicons as fa
-import calendar
-import numpy as np
-import seaborn as sns
-import plotly.express as px
 from shinywidgets import output_widget, render_widget
-import matplotlib.pyplot as plt
+
+# The shared data layer lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sales_data import CHART_MODULES, MAP_MODULES, STORE, preload
+from sales_data.compare import compare_server, compare_ui
+from sales_data.grid import grid_server, grid_ui
+from sales_data.plots import chart, output_chart, render_chart
+from sales_data.instrument import perf_panel_server, perf_panel_ui, timed
+from sales_data.maps import state_map
+from sales_data.views import city_view, date_range_input, date_range_server, date_window, snapshot_poll
+from sales_data.warmup import WARMUP, hourly_chart, monthly_chart
 
 # ICONS for value boxes
 ICONS = {
@@ -38,20 +45,16 @@ app_ui = ui.page_fluid(
                 ui.input_radio_buttons(
                     "nav",
                     "",
-                    {"sales_data": "Sales Data", "heatmaps": "Heatmaps"},
+                    {"sales_data": "Sales Data", "heatmaps": "Heatmaps", "compare": "Compare Cities"},
                     selected="sales_data"
                 ),
                 ui.h4("Filters", class_="mt-4"),
                 ui.input_select(
                     id="city",
                     label="Select a City:",
-                    choices=[
-                        "Dallas (TX)", "Boston (MA)", "Los Angeles (CA)",
-                        "San Francisco (CA)", "Seattle (WA)", "Atlanta (GA)",
-                        "New York City (NY)", "Portland (OR)", "Austin (TX)",
-                        "Portland (ME)"
-                    ]
-                )
+                    choices=STORE.snapshot().city_index.cities
+                ),
+                date_range_input("dates", STORE.snapshot())
             ),
             class_="bg-light"  # Moved class_ to end of arguments
         ),
@@ -77,7 +80,7 @@ app_ui = ui.page_fluid(
                         class_="d-flex align-items-center justify-content-between"
                     )
                 ),
-                ui.output_plot("sales_over_time_chart"),
+                output_chart("sales_over_time_chart"),
                 ui.modal(
                     "Analysis Summary",
                     ui.output_ui("sales_info_content"),
@@ -87,7 +90,7 @@ app_ui = ui.page_fluid(
                 )
             ),
             ui.card(
-                ui.output_data_frame("sales")
+                grid_ui("sales")
             )
         ),
         
@@ -95,54 +98,44 @@ app_ui = ui.page_fluid(
             "input.nav === 'heatmaps'",
             ui.card(
                 ui.card_header("Sales by Time of Day Heatmap"),
-                ui.output_plot("plot_sales_by_time")
+                output_chart("plot_sales_by_time")
             ),
             ui.card(
                 ui.card_header("Sales Distribution Map"),
                 output_widget("sales_map")
             )
+        ),
+
+        ui.panel_conditional(
+            "input.nav === 'compare'",
+            compare_ui("compare", STORE.snapshot().city_index.cities)
         )
-    )
+    ),
+
+    # Timing panel, shown with ?admin=<SALES_ADMIN_TOKEN> when SALES_PROFILE=1
+    perf_panel_ui()
 )
 
 def server(input, output, session):
-    @reactive.calc
-    def dat():
-        df = pd.read_csv("C:/Users/revat/Documents/datasets/sales.csv")
-        df["order_date"] = pd.to_datetime(df["order_date"], dayfirst=True)
-        df["month"] = df["order_date"].dt.month_name()
-        df["hour"] = df["order_date"].dt.hour
-        df["value"] = df["quantity_ordered"] * df["price_each"]
-        return df
+    snapshot = snapshot_poll()
+    date_range_server("dates", input.dates, snapshot)
+    view = city_view(snapshot, input.city, input.dates)
 
     @reactive.calc
+    @timed
     def metrics():
-        df = dat()
-        city_data = df[df['city'] == input.city()]
-        
-        total_sales = city_data["value"].sum()
-        total_orders = city_data["quantity_ordered"].sum()
+        city, snap, dates = view()
+        total_sales, total_orders, _ = snap.cube.totals(city, dates)
         avg_order_value = total_sales / total_orders if total_orders > 0 else 0
         return total_sales, total_orders, avg_order_value
 
     @reactive.calc
+    @timed
     def sales_analysis():
-        df = dat()
-        city_data = df[df['city'] == input.city()]
-        
-        monthly_sales = city_data.groupby('month')['value'].sum()
-        best_month = monthly_sales.idxmax()
-        worst_month = monthly_sales.idxmin()
-        
-        total_sales = city_data['value'].sum()
-        peak_hour = city_data.groupby('hour')['quantity_ordered'].sum().idxmax()
-        
-        return {
-            'best_month': best_month,
-            'worst_month': worst_month,
-            'peak_hour': peak_hour,
-            'total_sales': total_sales
-        }
+        city, snap, dates = view()
+        return snap.cube.insights(city, dates)
+
+    perf_panel_server(input, output, session)
 
     @reactive.effect
     @reactive.event(input.show_info)
@@ -151,26 +144,30 @@ def server(input, output, session):
 
     @output
     @render.ui
+    @timed
     def sales_info_content():
         analysis = sales_analysis()
+        # None when the date window has no orders
+        peak_hour = analysis['peak_hour']
         return ui.div(
             ui.tags.p(
                 ui.tags.strong("Best Performing Month: "), 
-                analysis['best_month']
+                analysis['best_month'] or "—"
             ),
             ui.tags.p(
                 ui.tags.strong("Lowest Performing Month: "), 
-                analysis['worst_month']
+                analysis['worst_month'] or "—"
             ),
             ui.tags.p(
                 ui.tags.strong("Peak Sales Hour: "), 
-                f"{analysis['peak_hour']}:00"
+                "—" if peak_hour is None else f"{peak_hour}:00"
             ),
             class_="p-3"
         )
 
     @output
     @render.ui
+    @timed
     def sales_box():
         total_sales, _, _ = metrics()
         return ui.value_box(
@@ -183,6 +180,7 @@ def server(input, output, session):
 
     @output
     @render.ui
+    @timed
     def orders_box():
         _, total_orders, _ = metrics()
         return ui.value_box(
@@ -195,6 +193,7 @@ def server(input, output, session):
 
     @output
     @render.ui
+    @timed
     def avg_box():
         _, _, avg_order_value = metrics()
         return ui.value_box(
@@ -206,86 +205,40 @@ def server(input, output, session):
         )
 
     @output
-    @render.plot
-    def sales_over_time_chart():
-        df = dat()
-        sales = df.groupby(["city", "month"])["quantity_ordered"].sum().reset_index()
-        sales_by_city = sales[sales["city"] == input.city()]
-        
-        month_map = {month: i for i, month in enumerate(calendar.month_name[1:], 1)}
-        sales_by_city['month_num'] = sales_by_city['month'].map(month_map)
-        sales_by_city = sales_by_city.sort_values('month_num')
-        
-        plt.figure(figsize=(12, 6))
-        plt.bar(sales_by_city['month'], sales_by_city['quantity_ordered'])
-        plt.title(f"Sales over Time -- {input.city()}")
-        plt.xlabel("Month")
-        plt.ylabel("Number of Orders")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+    @render_chart
+    @timed
+    async def sales_over_time_chart():
+        city, snap, dates = view()
+        sales_by_city = snap.cube.by_month(city, dates)
+        return await chart(("sales_over_time_chart", *view().key), "monthly_orders", sales_by_city, city)
 
-    @output
-    @render.data_frame
-    def sales():
-        df = dat()
-        return df[df['city'] == input.city()].head(1000)
+    # Paged on the server: only the visible rows are sent
+    grid_server("sales", view)
+
+    # All selected cities come from one pass over the cube
+    compare_server("compare", snapshot, input.dates)
 
     @output
-    @render.plot
-    def plot_sales_by_time():
-        df = dat()
-        city_data = df[df['city'] == input.city()]
-        sales_by_hour = city_data['hour'].value_counts().reindex(np.arange(0,24), fill_value=0)
-        
-        plt.figure(figsize=(10, 8))
-        heatmap_data = sales_by_hour.values.reshape(24, 1)
-        sns.heatmap(
-            heatmap_data,
-            annot=True,
-            fmt="d",
-            cmap="coolwarm",
-            cbar=False,
-            xticklabels=[],
-            yticklabels=[f"{i}:00" for i in range(24)]
-        )
-        
-        plt.title(f"Number of Orders by Hour of Day in {input.city()}")
-        plt.xlabel("Hour of Day")
-        plt.ylabel("Order Count")
+    @render_chart
+    @timed
+    async def plot_sales_by_time():
+        city, snap, dates = view()
+        sales_by_hour = snap.cube.by_hour(city, dates)['orders']
+        return await chart(("plot_sales_by_time", *view().key), "hourly_orders", sales_by_hour, city)
 
     @output
     @render_widget
+    @timed
     def sales_map():
-        df = dat()
-        # Aggregate sales data by state
-        df['state'] = df['city'].str.extract(r'\((.*?)\)').iloc[:, 0]
-        state_sales = df.groupby('state')['value'].sum().reset_index()
-        
-        # Create choropleth map
-        fig = px.choropleth(
-            state_sales,
-            locations='state',
-            locationmode="USA-states",
-            color='value',
-            scope="usa",
-            color_continuous_scale="Viridis",
-            labels={'value': 'Total Sales ($)'},
-            title='Sales Distribution by State'
-        )
-        
-        # Update layout
-        fig.update_layout(
-            margin={"r": 0, "t": 30, "l": 0, "b": 0},
-            geo=dict(
-                scope='usa',
-                showland=True,
-                landcolor='rgb(243, 243, 243)',
-                showframe=False,
-                showcoastlines=True,
-                projection_type='albers usa'
-            )
-        )
-        
-        return fig
+        # Same figure for every city and session; built once per data version
+        # (a date window is rolled up from the cube per session). Not read
+        # from the view, so choosing a city doesn't redraw it
+        snap = snapshot()
+        return state_map(snap, date_window(snap, input.dates()))
+
+# Fill the shared caches for every city in the background, most popular first
+WARMUP.start({"sales_over_time_chart": monthly_chart, "plot_sales_by_time": hourly_chart})
+# Plotting libraries load on first render; import them once the server is up
+preload(*CHART_MODULES, *MAP_MODULES)
 
 app = App(app_ui, server)
\ No newline at end of file
@@ -1,8 +1,22 @@
+import sys
+from pathlib import Path
 from shiny import App, ui
+
+# The shared data layer lives at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
 from sales_page import sales_ui, sales_server
 from heatmap_page import heatmap_ui, heatmap_server
 from multiple_page import multiple_ui, multiple_server
+from compare_page import compare_page_ui, compare_page_server
 import faicons as fa
+from sales_data import CHART_MODULES, MAP_MODULES, STORE, preload
+from sales_data.instrument import perf_panel_server, perf_panel_ui
+from sales_data.views import date_range_input, date_range_server, snapshot_poll
+from sales_data.warmup import WARMUP, hourly_chart, monthly_chart
+
+# Dropdown choices come from the loaded data rather than a fixed list
+CITIES = STORE.snapshot().city_index.cities
 
 app_ui = ui.page_fillable(
     ui.layout_sidebar(
@@ -14,10 +28,16 @@ app_ui = ui.page_fillable(
                 {
                     "sales_data": "Sales Data", 
                     "heatmaps": "Heatmaps",
-                    "multiple": "Multiple Pages"
+                    "multiple": "Multiple Pages",
+                    "compare": "Compare Cities"
                 },
                 selected="sales_data"
             ),
+            # Every page shows the same date window
+            ui.card(
+                ui.card_header("Dates"),
+                date_range_input("dates", STORE.snapshot())
+            ),
             ui.panel_conditional(
                 "input.nav === 'sales_data'",
                 ui.card(
@@ -25,12 +45,7 @@ app_ui = ui.page_fillable(
                     ui.input_select(
                         id="city",
                         label="Select a City:",
-                        choices=[
-                            "Dallas (TX)", "Boston (MA)", "Los Angeles (CA)",
-                            "San Francisco (CA)", "Seattle (WA)", "Atlanta (GA)",
-                            "New York City (NY)", "Portland (OR)", "Austin (TX)",
-                            "Portland (ME)"
-                        ]
+                        choices=CITIES
                     )
                 )
             ),
@@ -41,12 +56,7 @@ app_ui = ui.page_fillable(
                     ui.input_select(
                         id="city_heatmap",
                         label="Select a City:",
-                        choices=[
-                            "Dallas (TX)", "Boston (MA)", "Los Angeles (CA)",
-                            "San Francisco (CA)", "Seattle (WA)", "Atlanta (GA)",
-                            "New York City (NY)", "Portland (OR)", "Austin (TX)",
-                            "Portland (ME)"
-                        ]
+                        choices=CITIES
                     )
                 )
             ),
@@ -81,14 +91,30 @@ app_ui = ui.page_fillable(
         ui.panel_conditional(
             "input.nav === 'multiple'",
             multiple_ui
-        )
+        ),
+        ui.panel_conditional(
+            "input.nav === 'compare'",
+            compare_page_ui
+        ),
+        # Timing panel, shown with ?admin=<SALES_ADMIN_TOKEN> when SALES_PROFILE=1
+        perf_panel_ui()
     )
 )
 
 def server(input, output, session):
-    sales_server(input, output, session)
-    heatmap_server(input, output, session)
-    multiple_server(input, output, session)
+    # One poll of the shared data per session, read by every page
+    snapshot = snapshot_poll()
+    date_range_server("dates", input.dates, snapshot)
+    sales_server(input, output, session, snapshot)
+    heatmap_server(input, output, session, snapshot)
+    multiple_server(input, output, session, snapshot)
+    compare_page_server(input, output, session, snapshot)
+    perf_panel_server(input, output, session)
+
+# Fill the shared caches for every city in the background, most popular first
+WARMUP.start({"sales_over_time_chart": monthly_chart, "heatmap_time": hourly_chart})
+# Plotting libraries load on first render; import them once the server is up
+preload(*CHART_MODULES, *MAP_MODULES)
 
 app = App(app_ui, server)
 
@@ -0,0 +1,12 @@
+# compare_page.py
+from shiny import ui
+from sales_data import STORE
+from sales_data.compare import compare_server, compare_ui
+
+compare_page_ui = ui.div(
+    compare_ui("compare", STORE.snapshot().city_index.cities)
+)
+
+def compare_page_server(input, output, session, snapshot):
+    # All selected cities come from one pass over the cube
+    compare_server("compare", snapshot, input.dates)
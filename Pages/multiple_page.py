@@ -1,14 +1,7 @@
-from shiny import App, render, ui
-import matplotlib.pyplot as plt
-import pandas as pd
-import calendar
-
-def load_data():
-    df = pd.read_csv("C:/Users/revat/Documents/datasets/sales.csv")
-    df["order_date"] = pd.to_datetime(df["order_date"], dayfirst=True)
-    df["month"] = df["order_date"].dt.month_name()
-    df["value"] = df["quantity_ordered"] * df["price_each"]
-    return df
+from shiny import App, render, ui, reactive
+from sales_data.instrument import timed
+from sales_data.plots import chart, output_chart, render_chart
+from sales_data.views import date_window
 
 multiple_ui = ui.div(
     ui.navset_tab(
@@ -16,16 +9,16 @@ multiple_ui = ui.div(
             ui.layout_column_wrap(
                 ui.navset_card_underline(
                     ui.nav_panel("Top Sellers",
-                        ui.output_plot("plot_top_sellers")
+                        output_chart("plot_top_sellers")
                     ),
                     ui.nav_panel("Top Sellers Value ($)",
-                        ui.output_plot("plot_top_sellers_value")
+                        output_chart("plot_top_sellers_value")
                     ),
                     ui.nav_panel("Lowest Sellers",
-                        ui.output_plot("plot_lowest_sellers")
+                        output_chart("plot_lowest_sellers")
                     ),
                     ui.nav_panel("Lowest Sellers Value ($)",
-                        ui.output_plot("plot_lowest_sellers_value")
+                        output_chart("plot_lowest_sellers_value")
                     ),
                     id="tab"
                 ),
@@ -52,69 +45,71 @@ multiple_ui = ui.div(
     )
 )
 
-def multiple_server(input, output, session):
+def multiple_server(input, output, session, snapshot):
+    # Per-product totals, sorted once per data version
+    @reactive.calc
+    @timed
+    def rankings():
+        return snapshot().product_ranking
+
+    # The sidebar's date window, or None for every date
+    @reactive.calc
+    @timed
+    def dates():
+        return date_window(snapshot(), input.dates())
+
     @output
-    @render.plot
-    def plot_top_sellers():
-        df = load_data()
-        top_sales = df.groupby('product')['quantity_ordered'].sum().nlargest(input.n()).reset_index()
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.bar(top_sales['product'], top_sales['quantity_ordered'])
-        ax.set_xlabel('Product')
-        ax.set_ylabel('Quantity Ordered')
-        ax.set_title(f'Top {input.n()} Products by Quantity Sold')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        return fig
+    @render_chart
+    @timed
+    async def plot_top_sellers():
+        n = input.n()
+        top_sales = rankings().top('quantity_ordered', n, dates())
+        return await chart(
+            ("plot_top_sellers", n, snapshot().version, dates()),
+            "product_bars", top_sales, 'quantity_ordered', f'Top {n} Products by Quantity Sold', 'Quantity Ordered'
+        )
 
     @output
-    @render.plot
-    def plot_top_sellers_value():
-        df = load_data()
-        top_sales = df.groupby('product')['value'].sum().nlargest(input.n()).reset_index()
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.bar(top_sales['product'], top_sales['value'])
-        ax.set_xlabel('Product')
-        ax.set_ylabel('Total Sales Value ($)')
-        ax.set_title(f'Top {input.n()} Products by Sales Value')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        return fig
+    @render_chart
+    @timed
+    async def plot_top_sellers_value():
+        n = input.n()
+        top_sales = rankings().top('value', n, dates())
+        return await chart(
+            ("plot_top_sellers_value", n, snapshot().version, dates()),
+            "product_bars", top_sales, 'value', f'Top {n} Products by Sales Value', 'Total Sales Value ($)'
+        )
 
     @output
-    @render.plot
-    def plot_lowest_sellers():
-        df = load_data()
-        lowest_sales = df.groupby('product')['quantity_ordered'].sum().nsmallest(input.n()).reset_index()
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.bar(lowest_sales['product'], lowest_sales['quantity_ordered'])
-        ax.set_xlabel('Product')
-        ax.set_ylabel('Quantity Ordered')
-        ax.set_title(f'Bottom {input.n()} Products by Quantity Sold')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        return fig
+    @render_chart
+    @timed
+    async def plot_lowest_sellers():
+        n = input.n()
+        lowest_sales = rankings().bottom('quantity_ordered', n, dates())
+        return await chart(
+            ("plot_lowest_sellers", n, snapshot().version, dates()),
+            "product_bars", lowest_sales, 'quantity_ordered', f'Bottom {n} Products by Quantity Sold', 'Quantity Ordered'
+        )
 
     @output
-    @render.plot
-    def plot_lowest_sellers_value():
-        df = load_data()
-        lowest_sales = df.groupby('product')['value'].sum().nsmallest(input.n()).reset_index()
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.bar(lowest_sales['product'], lowest_sales['value'])
-        ax.set_xlabel('Product')
-        ax.set_ylabel('Total Sales Value ($)')
-        ax.set_title(f'Bottom {input.n()} Products by Sales Value')
-        plt.xticks(rotation=45, ha='right')
-        plt.tight_layout()
-        return fig
+    @render_chart
+    @timed
+    async def plot_lowest_sellers_value():
+        n = input.n()
+        lowest_sales = rankings().bottom('value', n, dates())
+        return await chart(
+            ("plot_lowest_sellers_value", n, snapshot().version, dates()),
+            "product_bars", lowest_sales, 'value', f'Bottom {n} Products by Sales Value', 'Total Sales Value ($)'
+        )
 
     @output
     @render.text
+    @timed
     def output_b():
         return f"Square of your number: {input.number_b() ** 2}"
     
     @output
     @render.text
+    @timed
     def output_c():
         return f"Selected value: {input.slider_c()}"
\ No newline at end of file
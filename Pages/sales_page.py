@@ -1,9 +1,10 @@
 # sales_page.py
 from shiny import ui, render, reactive
-import pandas as pd
 import faicons as fa
-import calendar
-import matplotlib.pyplot as plt
+from sales_data.grid import grid_server, grid_ui
+from sales_data.instrument import timed
+from sales_data.plots import chart, output_chart, render_chart
+from sales_data.views import city_view
 
 # ICONS for value boxes
 ICONS = {
@@ -20,36 +21,29 @@ sales_ui = ui.div(
     ),
     ui.card(
         ui.card_header("Sales Over Time"),
-        ui.output_plot("sales_over_time_chart")
+        output_chart("sales_over_time_chart")
     ),
     ui.card(
         ui.card_header("Sales Data"),
-        ui.output_data_frame("sales_table")
+        grid_ui("sales_table")
     )
 )
 
-def sales_server(input, output, session):
-    @reactive.calc
-    def load_data():
-        df = pd.read_csv("C:/Users/revat/Documents/datasets/sales.csv")
-        df["order_date"] = pd.to_datetime(df["order_date"], dayfirst=True)
-        df["month"] = df["order_date"].dt.month_name()
-        df["value"] = df["quantity_ordered"] * df["price_each"]
-        return df
+def sales_server(input, output, session, snapshot):
+    view = city_view(snapshot, input.city, input.dates)
 
     @reactive.calc
+    @timed
     def city_metrics():
-        df = load_data()
-        city_data = df[df['city'] == input.city()]
-        
-        total_sales = city_data["value"].sum()
-        total_orders = city_data["quantity_ordered"].sum()
+        city, snap, dates = view()
+        total_sales, total_orders, _ = snap.cube.totals(city, dates)
         avg_order = total_sales / total_orders if total_orders > 0 else 0
         
         return total_sales, total_orders, avg_order
 
     @output
     @render.ui
+    @timed
     def sales_box():
         total_sales, _, _ = city_metrics()
         return ui.value_box(
@@ -61,6 +55,7 @@ def sales_server(input, output, session):
 
     @output
     @render.ui
+    @timed
     def orders_box():
         _, total_orders, _ = city_metrics()
         return ui.value_box(
@@ -72,6 +67,7 @@ def sales_server(input, output, session):
 
     @output
     @render.ui
+    @timed
     def avg_box():
         _, _, avg_order = city_metrics()
         return ui.value_box(
@@ -82,29 +78,15 @@ def sales_server(input, output, session):
         )
 
     @output
-    @render.plot
-    def sales_over_time_chart():
-        df = load_data()
-        city_data = df[df['city'] == input.city()]
-        
-        monthly_sales = city_data.groupby('month')['quantity_ordered'].sum().reset_index()
-        month_order = {month: idx for idx, month in enumerate(calendar.month_name[1:])}
-        monthly_sales['month_num'] = monthly_sales['month'].map(month_order)
-        monthly_sales = monthly_sales.sort_values('month_num')
-        
-        plt.figure(figsize=(12, 6))
-        plt.bar(monthly_sales['month'], monthly_sales['quantity_ordered'])
-        plt.title(f"Sales over Time -- {input.city()}")
-        plt.xlabel("Month")
-        plt.ylabel("Number of Orders")
-        plt.xticks(rotation=45)
-        plt.tight_layout()
+    @render_chart
+    @timed
+    async def sales_over_time_chart():
+        city, snap, dates = view()
+        monthly_sales = snap.cube.by_month(city, dates)
+        return await chart(("sales_over_time_chart", *view().key), "monthly_orders", monthly_sales, city)
 
-    @output
-    @render.data_frame
-    def sales_table():
-        df = load_data()
-        return df[df['city'] == input.city()].head(1000)
+    # Paged on the server: only the visible rows are sent
+    grid_server("sales_table", view)
 
 
 
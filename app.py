@@ -1,15 +1,21 @@
 from shiny import reactive
-from shiny.express import input, ui, render, app
-import pandas as pd
+from shiny.express import input, output, session, ui, render, app
+from sales_data import CHART_MODULES, STORE, lazy, preload
 import faicons as fa
-import altair as alt
-import calendar
-import numpy as np
-import seaborn as sns
-import folium
-from folium.plugins import HeatMap
-import matplotlib.pyplot as plt
 from shinywidgets import render_widget
+from sales_data.compare import compare_server, compare_ui
+from sales_data.grid import grid_server, grid_ui
+from sales_data.plots import chart, render_chart
+from sales_data.instrument import perf_panel_server, perf_panel_ui, timed
+from sales_data.views import city_view, date_range_input, date_range_server, snapshot_poll
+from sales_data.warmup import WARMUP, hourly_chart
+
+# Only the chart and map outputs need these; they load on first use, or
+# in the background once the server is up
+alt = lazy("altair")
+folium = lazy("folium")
+folium_plugins = lazy("folium.plugins")
+preload(*CHART_MODULES, "altair", "folium", "folium.plugins")
 
 # ICONS for value boxes
 ICONS = {
@@ -18,25 +24,20 @@ ICONS = {
     "avg": fa.icon_svg("calculator"),
 }
 
-# Define a function to load and preprocess the data
-@reactive.calc
-def dat():
-    df = pd.read_csv("C:/Users/revat/Documents/datasets/sales.csv") 
-    df["order_date"] = pd.to_datetime(df["order_date"], dayfirst=True)
-    df["month"] = df["order_date"].dt.month_name()
-    df["hour"] = df["order_date"].dt.hour
-    df["value"] = df["quantity_ordered"] * df["price_each"]
-    return df
+# Sales data is loaded once per process and shared by every session
+snapshot = snapshot_poll()
+date_range_server("dates", input.dates, snapshot)
+view = city_view(snapshot, input.city, input.dates)
+
+# Once per process: render every city's cached charts in the background
+WARMUP.start({"plot_sales_by_time": hourly_chart})
 
 # Modified metrics calculation to filter by selected city
 @reactive.calc
+@timed
 def metrics():
-    df = dat()
-    # Filter data for selected city
-    city_data = df[df['city'] == input.city()]
-    
-    total_sales = city_data["value"].sum()
-    total_orders = city_data["quantity_ordered"].sum()
+    city, snap, dates = view()
+    total_sales, total_orders, _ = snap.cube.totals(city, dates)
     avg_order_value = total_sales / total_orders if total_orders > 0 else 0
     return total_sales, total_orders, avg_order_value
 
@@ -59,17 +60,14 @@ with ui.navset_card_underline():
                 ui.input_select(
                     id="city",
                     label="Select a City:",
-                    choices=[
-                        "Dallas (TX)", "Boston (MA)", "Los Angeles (CA)",
-                        "San Francisco (CA)", "Seattle (WA)", "Atlanta (GA)",
-                        "New York City (NY)", "Portland (OR)", "Austin (TX)",
-                        "Portland (ME)"
-                    ]
+                    choices=STORE.snapshot().city_index.cities
                 )
+                date_range_input("dates", STORE.snapshot())
 
             # Value boxes outside sidebar using layout_columns
             with ui.layout_columns(cols=3):
                 @render.ui
+                @timed
                 def sales_box():
                     total_sales, _, _ = metrics()
                     return ui.value_box(
@@ -81,6 +79,7 @@ with ui.navset_card_underline():
                     )
 
                 @render.ui
+                @timed
                 def orders_box():
                     _, total_orders, _ = metrics()
                     return ui.value_box(
@@ -92,6 +91,7 @@ with ui.navset_card_underline():
                     )
 
                 @render.ui
+                @timed
                 def avg_box():
                     _, _, avg_order_value = metrics()
                     return ui.value_box(
@@ -105,27 +105,25 @@ with ui.navset_card_underline():
             # Charts
             with ui.card():
                 @render_widget
+                @timed
                 def sales_over_time_altair():
-                    df = dat()
-                    sales = df.groupby(["city", "month"])["quantity_ordered"].sum().reset_index()
-                    sales_by_city = sales[sales["city"] == input.city()]
-                    month_orders = list(calendar.month_name)[1:]
+                    city, snap, dates = view()
+                    monthly = snap.cube.by_month(city, dates)
+                    sales_by_city = monthly[["month_name", "quantity_ordered"]].rename(columns={"month_name": "month"})
                     
                     chart = alt.Chart(sales_by_city).mark_bar().encode(
-                        x=alt.X('month', sort=month_orders),
+                        x=alt.X('month', sort=list(sales_by_city["month"])),
                         y='quantity_ordered',
                         tooltip=['month', 'quantity_ordered']
                     ).properties(
-                        title=f"Sales over Time -- {input.city()}"
+                        title=f"Sales over Time -- {city}"
                     )
                     return chart
 
             with ui.card():
-                @render.data_frame
-                def sales():
-                    df = dat()
-                    # Filter the dataframe by selected city
-                    return df[df['city'] == input.city()].head(1000)
+                # Paged on the server: only the visible rows are sent
+                grid_ui("sales")
+                grid_server("sales", view)
 
     with ui.nav_panel("Heatmaps"):
         with ui.layout_columns(cols=1):
@@ -133,39 +131,34 @@ with ui.navset_card_underline():
                 with ui.card_header():
                     "Sales by Time of Day Heatmap"
 
-                @render.plot
-                def plot_sales_by_time():
-                    df = dat()
-                    # Filter data for selected city
-                    city_data = df[df['city'] == input.city()]
-                    sales_by_hour = city_data['hour'].value_counts().reindex(np.arange(0,24), fill_value=0)
-                    
-                    plt.figure(figsize=(10, 8))
-                    heatmap_data = sales_by_hour.values.reshape(24, 1)
-                    sns.heatmap(
-                        heatmap_data,
-                        annot=True,
-                        fmt="d",
-                        cmap="coolwarm",
-                        cbar=False,
-                        xticklabels=[],
-                        yticklabels=[f"{i}:00" for i in range(24)]
-                    )
-                    
-                    plt.title(f"Number of Orders by Hour of Day in {input.city()}")
-                    plt.xlabel("Hour of Day")
-                    plt.ylabel("Order Count")
+                @render_chart
+                @timed
+                async def plot_sales_by_time():
+                    city, snap, dates = view()
+                    sales_by_hour = snap.cube.by_hour(city, dates)["orders"]
+                    return await chart(("plot_sales_by_time", *view().key), "hourly_orders", sales_by_hour, city)
 
             with ui.card():
                 with ui.card_header():
                     "Sales by Location Map"
 
                 @render.ui
+                @timed
                 def plot_us_heatmap():
-                    df = dat()
-                    # Filter data for selected city
-                    city_data = df[df['city'] == input.city()]
-                    heatmap_data = city_data[['lat', 'long', 'quantity_ordered']].values
+                    # Pre-binned per data version and day; at most a few thousand cells
+                    city, snap, dates = view()
+                    heatmap_data = snap.spatial_points(city, dates)
                     map = folium.Map(location=[37.0902, -95.7129], zoom_start=4)
-                    HeatMap(heatmap_data).add_to(map)
+                    folium_plugins.HeatMap(heatmap_data).add_to(map)
+                    if dates is not None and not snap.spatial_windows:
+                        return ui.TagList(ui.p("This data has no daily map bins; the map shows every date."), map)
                     return map
+
+    with ui.nav_panel("Compare Cities"):
+        # All selected cities come from one pass over the cube
+        compare_ui("compare", STORE.snapshot().city_index.cities)
+        compare_server("compare", snapshot, input.dates)
+
+# Timing panel, shown with ?admin=<SALES_ADMIN_TOKEN> when SALES_PROFILE=1
+perf_panel_ui()
+perf_panel_server(input, output, session)
@@ -0,0 +1,501 @@
+# load.py
+"""Concurrent-session load test of one dashboard worker.
+
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/load.py APP_core/app.py --sessions 1 5 10 20 --output load.json
+
+For each session count a fresh worker of the app is started on a
+synthetic dataset (generated once under --data-dir, or --source) and N
+simulated browsers connect over the Shiny websocket. Each reads the page
+to find its inputs and outputs, sends the initial input values, then
+walks the script: change some inputs, wait until every output has been
+redrawn, think, repeat. Nothing leaves the machine.
+
+Reported per session count:
+
+* latency of each scripted step, send to last output updated, as
+  p50/p95/p99 overall and per changed input;
+* worker memory per session: RSS growth from a primed worker to one
+  holding N sessions, divided by N (Linux only; allocator noise swamps
+  it for small N);
+* event-loop lag: round trip of websocket pings sent every
+  --probe-interval on a connection of its own. The worker answers pings
+  on its event loop, so the time beyond the loopback round trip is time
+  the loop was busy.
+
+The script is JSON, ``{"rounds": 3, "think": [0.5, 2.0], "steps": [...]}``.
+Each step maps input ids to values sent together. A list is a random
+pick per session, and ``"*"`` picks any other choice the page offers for
+that input. Inputs the page doesn't have are dropped, so one script
+serves every app. Each browser reports all outputs as visible, so the
+numbers are an upper bound for one that renders only the current tab.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from html.parser import HTMLParser
+from pathlib import Path
+
+import numpy as np
+import websockets
+
+from run import ROOT, dataset, git_revision
+
+DEFAULT_SCRIPT = {
+    "rounds": 3,
+    "think": [0.5, 2.0],
+    "steps": [
+        {"city": "*"},
+        {"n": [3, 5, 7, 10]},
+        {"nav": "heatmaps"},
+        {"city_heatmap": "*"},
+        {"nav": "sales_data"},
+        {"city": "*"},
+    ],
+}
+OUTPUT_SIZE = (600, 400)
+PERCENTILES = (50, 95, 99)
+MiB = 1024 * 1024
+
+
+class Page(HTMLParser):
+    """Inputs and outputs of an app page, as the browser would bind them.
+
+    ``inputs`` maps each input's message key (id plus type suffix) to its
+    initial value, ``choices`` maps input ids to the values they offer and
+    ``outputs`` lists the output ids.
+    """
+
+    def __init__(self, html):
+        super().__init__()
+        self.inputs = {}
+        self.choices = {}
+        self.outputs = []
+        self._select = None
+        self._tabset = None
+        self.feed(html)
+        self.close()
+
+    def key(self, input_id):
+        """Message key of ``input_id``, or None if the page doesn't have it."""
+        for key in self.inputs:
+            if key.partition(":")[0] == input_id:
+                return key
+        return None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+        element_id = attrs.get("id")
+        if element_id and any(c.endswith("-output") for c in classes):
+            self.outputs.append(element_id)
+        if tag == "select" and element_id:
+            self._select = element_id
+            self.choices[element_id] = []
+            self.inputs[element_id] = [] if "multiple" in attrs else None
+        elif tag == "option" and self._select:
+            value = attrs.get("value", "")
+            self.choices[self._select].append(value)
+            if isinstance(self.inputs[self._select], list):
+                if "selected" in attrs:
+                    self.inputs[self._select].append(value)
+            elif self.inputs[self._select] is None or "selected" in attrs:
+                self.inputs[self._select] = value
+        elif tag == "ul" and "shiny-tab-input" in classes:
+            self._tabset = element_id
+            self.choices[element_id] = []
+        elif self._tabset and "data-value" in attrs:
+            self.choices[self._tabset].append(attrs["data-value"])
+            self.inputs.setdefault(self._tabset, attrs["data-value"])
+        elif tag == "input":
+            self._input(attrs, classes, element_id)
+        elif tag == "button" and "action-button" in classes and element_id:
+            self.inputs[f"{element_id}:shiny.action"] = 0
+
+    def handle_endtag(self, tag):
+        if tag == "select":
+            self._select = None
+        elif tag == "ul":
+            self._tabset = None
+
+    def _input(self, attrs, classes, element_id):
+        kind = attrs.get("type", "text")
+        if kind == "radio" and attrs.get("name"):
+            name = attrs["name"]
+            self.choices.setdefault(name, []).append(attrs.get("value"))
+            if "checked" in attrs or name not in self.inputs:
+                self.inputs[name] = attrs.get("value")
+        elif not element_id:
+            return
+        elif "js-range-slider" in classes:
+            bounds = [_number(attrs[a]) for a in ("data-from", "data-to") if a in attrs]
+            if attrs.get("data-data-type") == "date":
+                dates = [datetime.fromtimestamp(ms / 1000, timezone.utc).date().isoformat() for ms in bounds]
+                self.inputs[f"{element_id}:shiny.date"] = dates if len(dates) > 1 else dates[0]
+            else:
+                self.inputs[element_id] = bounds if len(bounds) > 1 else bounds[0]
+        elif kind == "checkbox":
+            self.inputs[element_id] = "checked" in attrs
+        elif kind == "number":
+            value = attrs.get("value")
+            self.inputs[element_id] = _number(value) if value not in (None, "") else None
+        elif any(c.startswith("shiny-input-") for c in classes):
+            self.inputs[element_id] = attrs.get("value", "")
+
+
+def _number(text):
+    # JSON numbers from the browser are integers when they can be
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+@dataclass
+class Results:
+    """Step latencies of every session, keyed by the inputs each step
+    changed, and output errors counted per output id."""
+
+    latencies: dict = field(default_factory=dict)
+    initial: list = field(default_factory=list)
+    errors: Counter = field(default_factory=Counter)
+    timeouts: int = 0
+
+    def add(self, inputs, seconds):
+        self.latencies.setdefault("+".join(sorted(inputs)), []).append(seconds)
+
+    def summary(self):
+        steps = [s for seconds in self.latencies.values() for s in seconds]
+        report = {"all": percentiles(steps), "initial": percentiles(self.initial)}
+        report.update({name: percentiles(seconds) for name, seconds in sorted(self.latencies.items())})
+        return report
+
+
+def percentiles(seconds):
+    if not seconds:
+        return {"count": 0}
+    values = np.percentile(seconds, PERCENTILES)
+    report = {f"p{p}_ms": round(v * 1000, 1) for p, v in zip(PERCENTILES, values)}
+    return {"count": len(seconds), **report, "max_ms": round(max(seconds) * 1000, 1)}
+
+
+class Client:
+    """One simulated browser session."""
+
+    def __init__(self, url, page, rng, timeout):
+        self.url = url
+        self.page = page
+        self.rng = rng
+        self.timeout = timeout
+        self.values = {key.partition(":")[0]: value for key, value in page.inputs.items()}
+        self.ws = None
+        self._messages = asyncio.Queue()
+        self._reader = None
+
+    async def connect(self, results):
+        self.ws = await websockets.connect(f"ws://{self.url}/websocket/", max_size=None)
+        self._reader = asyncio.create_task(self._read())
+        data = {
+            ".clientdata_pixelratio": 1,
+            ".clientdata_url_protocol": "http:",
+            ".clientdata_url_hostname": "127.0.0.1",
+            ".clientdata_url_pathname": "/",
+            ".clientdata_url_search": "",
+            ".clientdata_singletons": "",
+            ".clientdata_allowDataUriScheme": True,
+        }
+        for output in self.page.outputs:
+            data[f".clientdata_output_{output}_width"] = OUTPUT_SIZE[0]
+            data[f".clientdata_output_{output}_height"] = OUTPUT_SIZE[1]
+            data[f".clientdata_output_{output}_hidden"] = False
+        data.update(self.page.inputs)
+        results.initial.append(await self._send("init", data, results))
+
+    async def run(self, script, results):
+        for _ in range(script["rounds"]):
+            for step in script["steps"]:
+                update = self._resolve(step)
+                if not update:
+                    continue
+                seconds = await self._send("update", update, results)
+                if seconds is not None:
+                    results.add([key.partition(":")[0] for key in update], seconds)
+                await asyncio.sleep(self.rng.uniform(*script["think"]))
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+        if self.ws is not None:
+            await self.ws.close()
+
+    def _resolve(self, step):
+        update = {}
+        for input_id, value in step.items():
+            key = self.page.key(input_id)
+            if key is None:
+                continue
+            if value == "*":
+                others = [c for c in self.page.choices.get(input_id, []) if c != self.values[input_id]]
+                if not others:
+                    continue
+                value = self.rng.choice(others)
+            elif isinstance(value, list):
+                value = self.rng.choice(value)
+            if value != self.values[input_id]:
+                update[key] = self.values[input_id] = value
+        return update
+
+    async def _read(self):
+        async for raw in self.ws:
+            self._messages.put_nowait(json.loads(raw))
+
+    async def _send(self, method, data, results):
+        """Seconds until every output the message touched is redrawn, or
+        None on timeout.
+
+        An output is pending from its invalidation until it is
+        recalculated; one waiting on a background task stays pending until
+        the task's result is drawn. The step ends with the first flush of
+        values after a busy period that leaves nothing pending. (The
+        worker also goes briefly busy on its own, e.g. polling the data
+        file, so busy alone proves nothing.)
+        """
+        # Late updates from the previous step were shown while "thinking"
+        while not self._messages.empty():
+            results.errors.update((self._messages.get_nowait().get("errors") or {}).keys())
+        started = time.perf_counter()
+        await self.ws.send(json.dumps({"method": method, "data": data}))
+        pending = set()
+        busy = seen_busy = False
+        deadline = started + self.timeout
+        while True:
+            try:
+                message = await asyncio.wait_for(self._messages.get(), deadline - time.perf_counter())
+            except asyncio.TimeoutError:
+                results.timeouts += 1
+                return None
+            if message.get("progress", {}).get("type") == "binding":
+                pending.add(message["progress"]["message"]["id"])
+            if message.get("recalculating", {}).get("status") == "recalculated":
+                pending.discard(message["recalculating"]["name"])
+            if message.get("busy") == "busy":
+                busy = seen_busy = True
+            elif message.get("busy") == "idle":
+                busy = False
+            if "values" in message:
+                results.errors.update((message.get("errors") or {}).keys())
+                if seen_busy and not busy and not pending:
+                    return time.perf_counter() - started
+
+
+class LagProbe(threading.Thread):
+    """Websocket ping round trips to the worker, from a thread and event
+    loop of its own so the simulated sessions don't delay it."""
+
+    def __init__(self, url, interval):
+        super().__init__(name="lag-probe", daemon=True)
+        self.url = url
+        self.interval = interval
+        self.samples = []
+        self._done = threading.Event()
+
+    def run(self):
+        asyncio.run(self._probe())
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+    async def _probe(self):
+        async with websockets.connect(f"ws://{self.url}/websocket/") as ws:
+            while not self._done.is_set():
+                started = time.perf_counter()
+                await (await ws.ping())
+                self.samples.append(time.perf_counter() - started)
+                await asyncio.sleep(self.interval)
+
+
+class Worker:
+    """``shiny run`` of one app on a free local port."""
+
+    def __init__(self, app, source, cache_dir, env=None):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.url = f"127.0.0.1:{self.port}"
+        environ = dict(os.environ, SALES_CSV=str(source), SALES_CACHE_DIR=str(cache_dir), **(env or {}))
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "shiny", "run", str(app), "--port", str(self.port)],
+            cwd=ROOT, env=environ, stdout=self.log, stderr=subprocess.STDOUT,
+        )
+
+    def page(self, timeout=120):
+        """HTML of the app page, once the worker answers."""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with urllib.request.urlopen(f"http://{self.url}/", timeout=5) as response:
+                    return response.read().decode()
+            except OSError:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.log.seek(0)
+                    raise RuntimeError(f"Worker did not start:\n{self.log.read().decode(errors='replace')}")
+                time.sleep(0.2)
+
+    def rss(self):
+        """Resident memory in bytes, or None where /proc is unavailable."""
+        try:
+            with open(f"/proc/{self.process.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            return None
+        return None
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+
+
+async def drive(worker, page, sessions, script, args):
+    """Connect ``sessions`` clients, staggered over ``args.ramp`` seconds,
+    and run the script in each. Returns ``(results, rss after connecting)``."""
+    results = Results()
+    clients = [Client(worker.url, page, random.Random(args.seed + i), args.timeout) for i in range(sessions)]
+
+    async def connect(i, client):
+        await asyncio.sleep(args.ramp * i / sessions)
+        await client.connect(results)
+
+    try:
+        await asyncio.gather(*(connect(i, c) for i, c in enumerate(clients)))
+        connected_rss = worker.rss()
+        await asyncio.gather(*(c.run(script, results) for c in clients))
+    finally:
+        await asyncio.gather(*(c.close() for c in clients), return_exceptions=True)
+    return results, connected_rss
+
+
+def measure(app, source, sessions, script, args):
+    """One worker, primed by a single session, then loaded with ``sessions``."""
+    worker = Worker(app, source, Path(args.data_dir) / "load-cache", dict(args.env))
+    try:
+        page = Page(worker.page())
+        # Loads the data, imports and caches as the first visitor would
+        asyncio.run(drive(worker, page, 1, {**script, "rounds": 1, "think": [0, 0]}, args))
+        baseline = worker.rss()
+        probe = LagProbe(worker.url, args.probe_interval)
+        probe.start()
+        started = time.perf_counter()
+        try:
+            results, connected = asyncio.run(drive(worker, page, sessions, script, args))
+        finally:
+            probe.stop()
+        elapsed = time.perf_counter() - started
+        end = worker.rss()
+    finally:
+        worker.stop()
+    per_session = (connected - baseline) / sessions / MiB if baseline and connected else None
+    return {
+        "sessions": sessions,
+        "seconds": round(elapsed, 1),
+        "outputs": len(page.outputs),
+        "latency": results.summary(),
+        "errors": dict(results.errors),
+        "timeouts": results.timeouts,
+        "rss_baseline_mib": round(baseline / MiB, 1) if baseline else None,
+        "rss_end_mib": round(end / MiB, 1) if end else None,
+        "rss_per_session_mib": round(per_session, 2) if per_session is not None else None,
+        "loop_lag": percentiles(probe.samples),
+    }
+
+
+def capacity(results, input_id, threshold):
+    """Largest session count whose p95 latency for steps changing
+    ``input_id`` stays under ``threshold`` seconds (None if even the first
+    count doesn't)."""
+    best = None
+    for result in results:
+        latency = result["latency"].get(input_id, result["latency"]["all"])
+        if latency.get("count") and latency["p95_ms"] > threshold * 1000:
+            break
+        best = result["sessions"]
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("app", help="app file, relative to the repository or here, e.g. APP_core/app.py")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 20])
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic dataset size")
+    parser.add_argument("--source", help="sales CSV to serve instead of a synthetic one")
+    parser.add_argument("--data-dir", default=tempfile.gettempdir())
+    parser.add_argument("--script", help="JSON script file (default: city/n/nav/city_heatmap switches)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="seconds over which sessions connect")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for one step")
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="seconds between lag probes")
+    parser.add_argument("--threshold", type=float, default=1.0, help="p95 step latency limit, seconds")
+    parser.add_argument("--input", default="city", help="input whose steps the limit applies to")
+    parser.add_argument("--env", nargs="*", default=[], type=lambda s: tuple(s.split("=", 1)),
+                        metavar="NAME=VALUE", help="extra worker environment, e.g. SALES_MODE=stream")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    app = Path(args.app)
+    if not app.exists():
+        app = ROOT / app
+    script = json.loads(Path(args.script).read_text()) if args.script else DEFAULT_SCRIPT
+    source = Path(args.source) if args.source else dataset(args.data_dir, args.rows)
+    results = []
+    for sessions in args.sessions:
+        result = measure(app.resolve(), source, sessions, script, args)
+        results.append(result)
+        latency = result["latency"].get(args.input, result["latency"]["all"])
+        lag = result["loop_lag"]
+        print(
+            f"{sessions:>5} sessions  {args.input} p50 {latency.get('p50_ms', 0):8.0f} ms"
+            f"  p95 {latency.get('p95_ms', 0):8.0f} ms  p99 {latency.get('p99_ms', 0):8.0f} ms"
+            f"  lag p99 {lag.get('p99_ms', 0):7.0f} ms"
+            f"  {result['rss_per_session_mib'] or 0:6.1f} MiB/session"
+            f"  {sum(result['errors'].values())} errors, {result['timeouts']} timeouts",
+            file=sys.stderr,
+        )
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "app": args.app,
+        "source": str(source),
+        "script": script,
+        "threshold_seconds": args.threshold,
+        "capacity": capacity(results, args.input, args.threshold),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
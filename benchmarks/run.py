@@ -0,0 +1,172 @@
+# run.py
+"""Headless micro-benchmarks for the dashboard data paths.
+
+    python benchmarks/run.py --rows 100000 1000000 --output bench.json
+
+For each size a synthetic dataset is generated (once, under --data-dir)
+and every stage is timed: CSV load, derivation, cache write/read, cube
+and ranking builds, per-city filtering, metrics(), sales_analysis(), the
+per-output aggregations and each chart render. Results are written as
+JSON so runs can be compared across changes.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import matplotlib
+import numpy as np
+import pandas as pd
+
+# The shared data layer lives at the repository root
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from sales_data import cache, charts, synthetic  # noqa: E402
+from sales_data.cube import SalesCube  # noqa: E402
+from sales_data.rankings import ProductRanking  # noqa: E402
+from sales_data.rendering import render_png  # noqa: E402
+from sales_data.spatial import SpatialBins  # noqa: E402
+from sales_data.store import SalesStore, derive_columns, read_sales_chunks  # noqa: E402
+from sales_data.streaming import stream_sales  # noqa: E402
+
+CHART_SIZE = (600, 400)
+
+
+def timeit(fn, repeat):
+    """Run ``fn`` ``repeat`` times; return per-run seconds and the last result."""
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return times, result
+
+
+def dataset(data_dir, rows):
+    path = Path(data_dir) / f"sales-{rows}.csv"
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        synthetic.generate(path, rows)
+    return path
+
+
+def stages(path, repeat):
+    """Yield ``(stage, seconds list)`` for every benchmarked step on one file."""
+    raw_times, raw = timeit(lambda: pd.read_csv(path), 1)
+    yield "load_csv", raw_times
+    derive_times, df = timeit(lambda: derive_columns(raw.copy()), 1)
+    yield "derive", derive_times
+
+    with tempfile.TemporaryDirectory() as tmp:
+        target = Path(tmp) / "sales.arrow"
+        yield "cache_write", timeit(lambda: cache.write_cache(target, df), 1)[0]
+        yield "cache_read", timeit(lambda: cache.read_cache(target), repeat)[0]
+        yield "stream_load", timeit(lambda: stream_sales(read_sales_chunks(path), tmp), 1)[0]
+
+    store = SalesStore(str(path), mode="memory")
+    snap = store.snapshot()
+    cube_times, cube = timeit(lambda: SalesCube.from_frame(df), 1)
+    yield "build_cube", cube_times
+    yield "build_product_ranking", timeit(lambda: ProductRanking.from_frame(df), 1)[0]
+    yield "build_city_index", timeit(lambda: type(snap.city_index).from_frame(df), repeat)[0]
+    yield "build_spatial_bins", timeit(lambda: SpatialBins.from_frame(df), 1)[0]
+
+    city = df["city"].value_counts().idxmax()
+    yield "filter_city_mask", timeit(lambda: df[df["city"] == city], repeat)[0]
+    yield "filter_city_index", timeit(lambda: snap.city_rows(city), repeat)[0]
+    # A month-long window in the middle of the data
+    first, last = snap.date_bounds
+    dates = (first + (last - first) / 2, first + (last - first) / 2 + pd.Timedelta(days=30))
+    yield "filter_city_dates_mask", timeit(
+        lambda: df[(df["city"] == city) & (df["order_date"] >= dates[0]) & (df["order_date"] < dates[1])], repeat
+    )[0]
+    yield "filter_city_dates_index", timeit(lambda: snap.city_rows(city, dates), repeat)[0]
+
+    # A cube remembers its full-range results; time each run on a fresh one
+    # so these measure the aggregation, not a dict lookup
+    def fresh():
+        return SalesCube(cube.table)
+
+    def metrics():
+        total_sales, total_orders, _ = fresh().totals(city)
+        return total_sales, total_orders, total_sales / total_orders if total_orders else 0
+
+    yield "metrics", timeit(metrics, repeat)[0]
+    yield "sales_analysis", timeit(lambda: fresh().insights(city), repeat)[0]
+    yield "agg_by_month", timeit(lambda: fresh().by_month(city), repeat)[0]
+    yield "agg_by_hour", timeit(lambda: fresh().by_hour(city), repeat)[0]
+    yield "agg_by_city", timeit(lambda: cube.rollup(["city"]), repeat)[0]
+    yield "agg_by_month_dates", timeit(lambda: cube.by_month(city, dates), repeat)[0]
+    ranking = snap.product_ranking
+    yield "agg_top_products", timeit(lambda: ranking.top("value", 5), repeat)[0]
+
+    by_month = cube.by_month(city)
+    by_hour = cube.by_hour(city)["orders"]
+    top = ranking.top("quantity_ordered", 5)
+    renders = {
+        "render_monthly_orders": lambda fig: charts.monthly_orders(fig, by_month, city),
+        "render_hourly_orders": lambda fig: charts.hourly_orders(fig, by_hour, city),
+        "render_product_bars": lambda fig: charts.product_bars(
+            fig, top, "quantity_ordered", "Top 5 Products by Quantity Sold", "Quantity Ordered"
+        ),
+    }
+    for stage, draw in renders.items():
+        yield stage, timeit(lambda: render_png(draw, *CHART_SIZE), repeat)[0]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each cheap stage")
+    parser.add_argument("--data-dir", default=tempfile.gettempdir())
+    parser.add_argument("--output", help="JSON file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    matplotlib.use("Agg")
+    results = []
+    for rows in args.rows:
+        path = dataset(args.data_dir, rows)
+        for stage, seconds in stages(path, args.repeat):
+            results.append({
+                "rows": rows,
+                "stage": stage,
+                "runs": len(seconds),
+                "min_seconds": min(seconds),
+                "median_seconds": statistics.median(seconds),
+            })
+            print(f"{rows:>12,} {stage:<24} {min(seconds) * 1000:10.2f} ms", file=sys.stderr)
+
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
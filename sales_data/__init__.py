@@ -0,0 +1,15 @@
+"""Shared data layer for the sales dashboards."""
+# First, so the optional import report times everything after it
+from .imports import CHART_MODULES, MAP_MODULES, lazy, preload
+from .store import DATA_PATH, SCHEMA, STORE, SalesStore, Snapshot, derive_columns, load_sales, memory_report, read_sales
+from .cube import MONTHS, SalesCube
+from .index import CityIndex
+from .rankings import ProductRanking
+from .spatial import SpatialBins
+from .streaming import CityFiles
+from .artifact import build_snapshot, load_snapshot, snapshot_dir
+from .paging import PAGE_SIZES, RowOrder
+from .plot_cache import PLOT_CACHE, PlotCache
+from .sessions import SESSIONS, SessionRegistry
+from .rendering import RENDER_POOL, RenderPool, render_png
+from .warmup import WARMUP, WarmUp
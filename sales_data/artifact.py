@@ -0,0 +1,210 @@
+# artifact.py
+"""Aggregate-only snapshots: everything the dashboards show, without the rows.
+
+``python -m sales_data.build`` loads the CSV once and writes a snapshot
+directory to ``SNAPSHOT_DIR``. It holds the cube, product ranking and
+spatial bins (also per day, for date windows) as Arrow files, the
+per-city insights in its manifest and, optionally, a sample of the rows.
+It then points ``current.json`` at it.
+Workers started with ``SALES_MODE=aggregate`` read only that snapshot.
+They boot in well under a second and hold a few MB, however large the
+CSV is.
+
+Only the data grid needs rows. It shows the sample, or, if the snapshot
+has none, the raw CSV is streamed to disk the first time the grid asks
+(see streaming.py).
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+from .cache import cache_dir, read_cache, read_manifest, write_cache, write_json, write_manifest
+from .cube import SalesCube
+from .index import CityIndex
+from .rankings import ProductRanking
+from .spatial import SpatialBins
+from .streaming import stream_sales
+
+# Bump when the snapshot layout changes
+FORMAT = 1
+# Snapshots kept besides the current one, for workers still reading them
+KEEP = 1
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_dir(path):
+    """Default snapshot directory for the source CSV ``path``."""
+    return Path(os.environ.get("SALES_SNAPSHOT_DIR") or cache_dir(path) / "snapshots")
+
+
+
+def build_snapshot(snapshot, directory, source=None, sample_rows=0, seed=0):
+    """Write the aggregates of ``snapshot`` (a ``store.Snapshot``) as the
+    next version in ``directory`` and make it current. Returns the manifest.
+
+    ``sample_rows`` rows, spread over the cities in proportion to their
+    row counts, are kept for the data grid.
+    """
+    if pyarrow is None:
+        raise RuntimeError("Building a snapshot needs pyarrow")
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        version = read_manifest(directory)["version"] + 1
+    except (OSError, ValueError, KeyError):
+        version = 1
+    name = f"snapshot-{version:06d}"
+    cube = snapshot.cube
+    counts = snapshot.city_index.counts()
+    staging = Path(tempfile.mkdtemp(prefix=f".{name}-", dir=directory))
+    try:
+        write_cache(staging / "cube.arrow", cube.table.reset_index())
+        write_cache(staging / "products.arrow", snapshot.product_ranking.daily.reset_index())
+        bins = snapshot.spatial_bins
+        cells = list(bins.levels)
+        for i, cell in enumerate(cells):
+            write_cache(staging / f"spatial_{i}.arrow", bins.levels[cell].reset_index())
+        daily_cells = list(bins.daily or ())
+        for i, cell in enumerate(daily_cells):
+            write_cache(staging / f"spatial_daily_{i}.arrow", bins.daily[cell].reset_index())
+        sample = _sample(snapshot, counts, sample_rows, seed)
+        if len(sample):
+            write_cache(staging / "rows.arrow", sample)
+        manifest = {
+            "format": FORMAT,
+            "version": version,
+            "directory": name,
+            "source": str(source) if source else None,
+            "built": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "rows": sum(counts.values()),
+            "sample_rows": len(sample),
+            "cities": counts,
+            "cells": cells,
+            "daily_cells": daily_cells,
+            "insights": {city: _jsonable(cube.insights(city)) for city in counts},
+        }
+        write_json(staging / "manifest.json", manifest)
+        os.replace(staging, directory / name)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    write_manifest(directory, manifest)
+    _prune(directory, version)
+    return manifest
+
+
+def load_snapshot(directory):
+    """``(manifest, artifacts, sample)`` of the current snapshot in
+    ``directory``: ``artifacts`` maps ``Snapshot`` artifact names to the
+    aggregates, and ``sample`` is the sampled rows or None."""
+    manifest = read_manifest(directory)
+    if manifest.get("format") != FORMAT:
+        raise RuntimeError(f"Snapshot in {directory} has format {manifest.get('format')}, expected {FORMAT}")
+    target = Path(directory) / manifest["directory"]
+    cube = SalesCube(_read(target / "cube.arrow").set_index(["city", "day", "hour"]))
+    for city, insights in manifest["insights"].items():
+        cube.preset("insights", city, insights)
+    products = ProductRanking(_read(target / "products.arrow").set_index(["day", "product"]))
+    bins = SpatialBins({
+        cell: _read(target / f"spatial_{i}.arrow").set_index(["city", "lat_cell", "long_cell"])["quantity_ordered"]
+        for i, cell in enumerate(manifest["cells"])
+    })
+    # Snapshots built before daily bins were kept show maps over every date
+    if "daily_cells" in manifest:
+        bins.daily = {
+            cell: _read(target / f"spatial_daily_{i}.arrow").set_index(["city", "day", "lat_cell", "long_cell"])[
+                "quantity_ordered"
+            ]
+            for i, cell in enumerate(manifest["daily_cells"])
+        }
+    artifacts = {
+        "cube": cube,
+        "product_ranking": products,
+        "spatial_bins": bins,
+        "city_index": CityIndex.from_counts(manifest["cities"]),
+    }
+    sample = _read(target / "rows.arrow") if manifest["sample_rows"] else None
+    return manifest, artifacts, sample
+
+
+class SampleRows:
+    """The snapshot's sampled rows, served per city like ``CityFiles``."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.index = CityIndex.from_frame(frame)
+
+    def city_rows(self, city):
+        return self.frame.iloc[self.index.slice(city)]
+
+
+class RawRows:
+    """Rows streamed from the source CSV on first use, for snapshots
+    built without a sample. ``chunks()`` yields the derived chunks."""
+
+    def __init__(self, chunks, directory):
+        self.chunks = chunks
+        self.directory = directory
+        self._files = None
+        self._lock = threading.Lock()
+
+    def city_rows(self, city):
+        if self._files is None:
+            # Concurrent first requests would each stream the CSV into the same spill files
+            with self._lock:
+                if self._files is None:
+                    logger.info("Streaming raw rows for the data grid")
+                    self._files, _ = stream_sales(self.chunks(), self.directory)
+        return self._files.city_rows(city)
+
+
+def _read(target):
+    frame = read_cache(target)
+    if frame is None:
+        raise RuntimeError(f"Missing snapshot file {target}")
+    return frame
+
+
+def _sample(snapshot, counts, sample_rows, seed):
+    """About ``sample_rows`` rows, sorted like the snapshot's own rows."""
+    total = sum(counts.values())
+    if not sample_rows or not total:
+        return pd.DataFrame()
+    rng = np.random.default_rng(seed)
+    parts = []
+    for city, count in counts.items():
+        rows = snapshot.city_rows(city)
+        take = min(count, max(round(sample_rows * count / total), 1))
+        positions = np.sort(rng.choice(count, size=take, replace=False))
+        parts.append(rows.iloc[positions])
+    return pd.concat(parts, ignore_index=True)
+
+
+def _jsonable(insights):
+    return {
+        key: value.item() if isinstance(value, np.generic) else value
+        for key, value in insights.items()
+    }
+
+
+def _prune(directory, version):
+    for path in directory.glob("snapshot-*"):
+        try:
+            old = int(path.name.split("-")[1])
+        except ValueError:
+            continue
+        if old < version - KEEP:
+            shutil.rmtree(path, ignore_errors=True)
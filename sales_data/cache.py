@@ -0,0 +1,144 @@
+# cache.py
+"""Arrow IPC sidecar cache of the parsed sales data.
+
+The first load of a given source file writes the typed and derived columns
+next to it; later starts memory-map that file instead of parsing the CSV.
+pyarrow is optional: without it every load parses the CSV.
+
+The atomic JSON writes behind the publication and snapshot manifests
+(``current.json``) and the warm-up state live here too.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.environ.get("SALES_CACHE_DIR")
+# Names the current publication or snapshot in its directory
+MANIFEST = "current.json"
+# Bump when the derived columns change so old cache files are not reused
+CACHE_FORMAT = 5
+SAMPLE_BYTES = 1 << 20
+
+
+def source_digest(path, size=None):
+    """Hash identifying the first ``size`` bytes (default: all) of the source file.
+
+    Covers the file's mtime and the size and first and last MiB of that
+    prefix, so a multi-GB CSV is fingerprinted without reading all of it.
+    The mtime catches edits in the middle that keep the size.
+    """
+    st = os.stat(path)
+    if size is None:
+        size = st.st_size
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{CACHE_FORMAT}:{size}:{st.st_mtime_ns}".encode())
+    with open(path, "rb") as f:
+        h.update(f.read(min(size, SAMPLE_BYTES)))
+        if size > SAMPLE_BYTES:
+            start = max(size - SAMPLE_BYTES, SAMPLE_BYTES)
+            f.seek(start)
+            h.update(f.read(size - start))
+    return h.hexdigest()
+
+
+def cache_dir(path):
+    """Where cache files for the source ``path`` are kept."""
+    return Path(CACHE_DIR) if CACHE_DIR else Path(path).parent / ".sales_cache"
+
+
+def cache_path(path, size=None):
+    return cache_dir(path) / f"{Path(path).stem}-{source_digest(path, size)}.arrow"
+
+
+def read_cache(target):
+    """Memory-map a cache file and return it as a DataFrame, or None if missing."""
+    if pa is None or not target.exists():
+        return None
+    try:
+        with pa.memory_map(str(target), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        # split_blocks keeps numeric columns as views onto the mapped file
+        return table.to_pandas(split_blocks=True)
+    except (OSError, pa.ArrowInvalid) as e:
+        logger.warning("Ignoring unreadable sales cache %s: %s", target, e)
+        return None
+
+
+def write_cache(target, df, prune=True):
+    """Atomically write ``df`` to ``target`` and, with ``prune``, drop older
+    caches of the same source."""
+    if pa is None:
+        return
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp = None
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f, pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, target)
+    except OSError as e:
+        logger.warning("Could not write sales cache %s: %s", target, e)
+        if tmp is not None:
+            Path(tmp).unlink(missing_ok=True)
+        return
+    if prune:
+        remove_others(target)
+
+
+def remove_others(target):
+    """Remove the cache files of the same source as ``target`` but ``target``."""
+    stem = target.name.rsplit("-", 1)[0]
+    for old in target.parent.glob(f"{stem}-*.arrow"):
+        if old != target:
+            try:
+                old.unlink(missing_ok=True)
+            except OSError:
+                # Still memory-mapped by another process on Windows
+                pass
+
+
+def read_sales_cached(path, parse, size=None):
+    """Load the first ``size`` bytes of ``path`` from the cache if present,
+    otherwise ``parse(path, size)`` them and cache the result."""
+    if pa is None:
+        return parse(path, size)
+    target = cache_path(path, size)
+    df = read_cache(target)
+    if df is None:
+        df = parse(path, size)
+        write_cache(target, df)
+    return df
+
+
+def write_json(target, data):
+    """Atomically replace ``target`` with ``data`` as JSON: readers see the
+    old file or the new one, never a partial write."""
+    fd, tmp = tempfile.mkstemp(dir=Path(target).parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, target)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def read_manifest(directory):
+    with open(Path(directory) / MANIFEST) as f:
+        return json.load(f)
+
+
+def write_manifest(directory, manifest):
+    write_json(Path(directory) / MANIFEST, manifest)
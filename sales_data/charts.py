@@ -0,0 +1,87 @@
+# charts.py
+"""Matplotlib drawings shared by the dashboards.
+
+Each function draws onto a figure it is given, so the same chart can be
+rendered for any output size and cached as an image.
+"""
+import numpy as np
+
+from .imports import lazy
+
+artist = lazy("matplotlib.artist")
+sns = lazy("seaborn")
+
+
+def monthly_orders(fig, monthly, city):
+    """Bar chart of quantity ordered per month; ``monthly`` is ``SalesCube.by_month``."""
+    ax = fig.add_subplot()
+    ax.bar(monthly["month_name"], monthly["quantity_ordered"])
+    ax.set_title(f"Sales over Time -- {city}")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Number of Orders")
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+
+
+def hourly_orders(fig, counts, city):
+    """Single-column heatmap of order counts for each of the 24 hours."""
+    ax = fig.add_subplot()
+    sns.heatmap(
+        counts.to_numpy().reshape(24, 1),
+        annot=True,
+        fmt="d",
+        cmap="coolwarm",
+        cbar=False,
+        xticklabels=[],
+        yticklabels=[f"{i}:00" for i in range(24)],
+        ax=ax
+    )
+    ax.set_title(f"Number of Orders by Hour of Day in {city}")
+    ax.set_xlabel("Hour of Day")
+    ax.set_ylabel("Order Count")
+    fig.tight_layout()
+
+
+def product_bars(fig, ranked, measure, title, ylabel):
+    """Bar chart of one ``ProductRanking`` slice."""
+    ax = fig.add_subplot()
+    ax.bar(ranked["product"].astype(str), ranked[measure])
+    ax.set_xlabel("Product")
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    artist.setp(ax.get_xticklabels(), rotation=45, ha="right")
+    fig.tight_layout()
+
+
+def monthly_comparison(fig, monthly):
+    """Grouped bars of quantity ordered per month, one series per city;
+    ``monthly`` is the second frame of ``SalesCube.compare``."""
+    ax = fig.add_subplot()
+    positions = np.arange(len(monthly.index))
+    width = 0.8 / max(len(monthly.columns), 1)
+    for i, city in enumerate(monthly.columns):
+        ax.bar(positions + (i - (len(monthly.columns) - 1) / 2) * width, monthly[city], width, label=city)
+    ax.set_xticks(positions, monthly.index)
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.set_title("Sales over Time by City")
+    ax.set_xlabel("Month")
+    ax.set_ylabel("Number of Orders")
+    ax.legend(fontsize="small")
+    fig.tight_layout()
+
+
+def hourly_comparison(fig, hourly):
+    """Heatmap of order counts, a row per city and a column per hour;
+    ``hourly`` is the third frame of ``SalesCube.compare``."""
+    ax = fig.add_subplot()
+    sns.heatmap(
+        hourly.T.to_numpy(),
+        cmap="coolwarm",
+        xticklabels=[f"{i}:00" for i in hourly.index],
+        yticklabels=list(hourly.columns),
+        ax=ax
+    )
+    ax.set_title("Number of Orders by Hour of Day")
+    ax.set_xlabel("Hour of Day")
+    ax.tick_params(axis="y", labelrotation=0)
+    fig.tight_layout()
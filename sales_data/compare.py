@@ -0,0 +1,93 @@
+# compare.py
+"""Side-by-side comparison of several cities.
+
+Every output comes from one ``SalesCube.compare`` call, so the cost
+doesn't grow with the number of cities selected.
+"""
+import faicons as fa
+from shiny import module, reactive, render, req, ui
+
+from . import charts
+from .instrument import timed
+from .plots import cached_plot, data_image
+from .sessions import SESSIONS
+from .views import date_window
+
+# Most cities compared at once; more would not fit side by side
+MAX_CITIES = 6
+
+
+@module.ui
+def compare_ui(cities):
+    return ui.div(
+        ui.input_selectize(
+            "cities",
+            "Cities to compare:",
+            cities,
+            selected=cities[:2],
+            multiple=True,
+            options={"maxItems": MAX_CITIES}
+        ),
+        ui.output_ui("boxes"),
+        ui.card(
+            ui.card_header("Sales Over Time"),
+            ui.output_plot("monthly")
+        ),
+        ui.card(
+            ui.card_header("Sales by Time of Day"),
+            ui.output_plot("hourly")
+        )
+    )
+
+
+@module.server
+def compare_server(input, output, session, snapshot, dates=None):
+    """``snapshot`` is the session's polled snapshot calc and ``dates`` the
+    optional date range input to restrict the comparison to."""
+
+    @reactive.calc
+    @timed
+    def comparison():
+        cities = list(input.cities())
+        req(cities)
+        snap = snapshot()
+        window = date_window(snap, dates()) if dates is not None else None
+        versions = (tuple(snap.city_version(city) for city in cities), window)
+        return SESSIONS.track("comparison", (cities, versions, snap.cube.compare(cities, window)))
+
+    @render.ui
+    @timed
+    def boxes():
+        cities, _, (totals, _, _) = comparison()
+        return ui.layout_columns(*[
+            ui.value_box(
+                city,
+                f"${row.value:,.0f}",
+                # Orders and their average as on the Sales tab (see ``metrics``)
+                f"{row.quantity_ordered:,} orders · "
+                f"${row.value / row.quantity_ordered if row.quantity_ordered else 0:,.2f} average",
+                showcase=fa.icon_svg("chart-line"),
+                theme="bg-primary",
+                height="150px"
+            )
+            for city, row in zip(cities, totals.itertuples())
+        ])
+
+    # Rendered images are shared across sessions and cached per size
+    @data_image
+    @timed
+    async def monthly():
+        cities, versions, (_, monthly_sales, _) = comparison()
+        return await cached_plot(
+            ("compare_monthly", tuple(cities), versions),
+            lambda fig: charts.monthly_comparison(fig, monthly_sales)
+        )
+
+    @data_image
+    @timed
+    async def hourly():
+        cities, versions, (_, _, hourly_orders) = comparison()
+        return await cached_plot(
+            ("compare_hourly", tuple(cities), versions),
+            lambda fig: charts.hourly_comparison(fig, hourly_orders)
+        )
@@ -0,0 +1,197 @@
+# cube.py
+"""Pre-aggregated city x day x hour cube behind the dashboard outputs."""
+import calendar
+import functools
+
+import numpy as np
+import pandas as pd
+
+MONTHS = list(calendar.month_name)[1:]
+DIMENSIONS = ("city", "day", "hour")
+
+
+def city_states(cities):
+    """Two-letter state codes from city names like ``"Boston (MA)"``."""
+    return pd.Index(cities).str.extract(r"\((.*?)\)", expand=False)
+
+
+def month_labels(months):
+    """Labels for month-start dates: the month name, plus the year when
+    ``months`` spans more than one."""
+    months = pd.DatetimeIndex(months)
+    if months.year.nunique() > 1:
+        return list(months.strftime("%b %Y"))
+    return [MONTHS[m - 1] for m in months.month]
+
+
+def _full_range(method):
+    """Remember ``method(city)``'s result when no date window is given.
+
+    A cube never changes, so the first result per city stays valid for
+    every session reading this data version.
+    """
+    @functools.wraps(method)
+    def wrapper(self, city=None, dates=None):
+        if dates is not None:
+            return method(self, city, dates)
+        key = (method.__name__, city)
+        try:
+            return self._memo[key]
+        except KeyError:
+            result = self._memo[key] = method(self, city)
+            return result
+    return wrapper
+
+
+class SalesCube:
+    """Sum of ``value``, sum of ``quantity_ordered`` and order count per
+    (city, day, hour), where ``day`` is the order date at midnight.
+
+    Built once per data version; every coarser grain is a rollup of this
+    small table rather than another pass over the raw rows. Methods take an
+    optional ``dates`` window, ``(first day, last day)`` inclusive, which is
+    a slice of the sorted index rather than a mask.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._memo = {}
+
+    @classmethod
+    def from_frame(cls, df):
+        keys = [df["city"], df["order_date"].dt.normalize().rename("day"), df["hour"]]
+        table = df.groupby(keys, observed=True, sort=True).agg(
+            value=("value", "sum"),
+            quantity_ordered=("quantity_ordered", "sum"),
+            orders=("value", "size"),
+        )
+        # pandas may hand back the compact input type; merges must not overflow it
+        return cls(table.astype({"quantity_ordered": "int64", "orders": "int64"}))
+
+    def preset(self, name, city, result):
+        """Serve ``result`` as ``name(city)`` over every date, e.g. when
+        it was computed ahead of time."""
+        self._memo[(name, city)] = result
+
+    def merge(self, other):
+        """A cube covering the rows of both ``self`` and ``other``."""
+        table = self.table.add(other.table, fill_value=0).astype(self.table.dtypes)
+        return SalesCube(table.sort_index())
+
+    @property
+    def cities(self):
+        return list(self.table.index.unique("city"))
+
+    @property
+    def date_bounds(self):
+        """First and last day with any orders."""
+        days = self.table.index.get_level_values("day")
+        return days.min(), days.max()
+
+    def rollup(self, by=(), city=None, dates=None):
+        """Aggregate the cube to the dimensions in ``by``, optionally for one
+        city and date window. ``"month"`` groups days by calendar month
+        (month-start dates, so the same month of different years stays apart).
+
+        With an empty ``by`` the result is a single-row frame of totals.
+        """
+        table = self._select(city, dates)
+        if not by:
+            return table.sum().to_frame().T.astype(table.dtypes)
+        keys = [_months(table) if level == "month" else table.index.get_level_values(level) for level in by]
+        return table.groupby(keys, observed=True).sum()
+
+    @_full_range
+    def totals(self, city=None, dates=None):
+        """``(value, quantity_ordered, orders)`` for one city or overall."""
+        table = self._select(city, dates)
+        return table["value"].sum(), table["quantity_ordered"].sum(), table["orders"].sum()
+
+    @_full_range
+    def insights(self, city=None, dates=None):
+        """Best and worst month by value, peak hour by quantity and total value.
+
+        With no orders in the window the months and hour are None.
+        """
+        monthly = self.by_month(city, dates).set_index("month_name")["value"]
+        if monthly.empty:
+            return {"best_month": None, "worst_month": None, "peak_hour": None, "total_sales": 0.0}
+        return {
+            "best_month": monthly.idxmax(),
+            "worst_month": monthly.idxmin(),
+            "peak_hour": self.rollup(["hour"], city, dates)["quantity_ordered"].idxmax(),
+            "total_sales": monthly.sum(),
+        }
+
+    @_full_range
+    def by_month(self, city=None, dates=None):
+        """Monthly totals in date order with a ``month_name`` column."""
+        monthly = self.rollup(["month"], city, dates).reset_index()
+        return monthly.assign(month_name=month_labels(monthly["month"]))
+
+    @_full_range
+    def by_hour(self, city=None, dates=None):
+        """Hourly totals for all 24 hours, zero-filled."""
+        return self.rollup(["hour"], city, dates).reindex(np.arange(24), fill_value=0)
+
+    def by_state(self, dates=None):
+        """Total ``value`` per state."""
+        city_sales = self.rollup(["city"], dates=dates)["value"]
+        return city_sales.groupby(city_states(city_sales.index).to_numpy()).sum().rename_axis("state")
+
+    def compare(self, cities, dates=None):
+        """``(totals, monthly, hourly)`` for several cities from one bincount
+        over the cube, instead of one selection and rollup per city.
+
+        ``totals`` has a row per city with the three measures; ``monthly``
+        (quantity ordered, indexed by month label) and ``hourly`` (orders,
+        hours 0-23) have a column per city.
+        """
+        cities = list(cities)
+        table = self._select(None, dates)
+        slot = pd.Index(cities).get_indexer(table.index.get_level_values("city"))
+        keep = slot >= 0
+        months = _months(table)[keep]
+        calendar_months = months.unique().sort_values()
+        month = calendar_months.get_indexer(months)
+        hour = table.index.get_level_values("hour").to_numpy().astype(np.int64)[keep]
+        shape = (len(cities), len(calendar_months), 24)
+        cell = (slot[keep] * shape[1] + month) * 24 + hour
+        dense = {
+            measure: np.bincount(
+                cell, weights=table[measure].to_numpy()[keep], minlength=np.prod(shape)
+            ).reshape(shape)
+            for measure in table.columns
+        }
+        totals = pd.DataFrame(
+            {measure: grid.sum(axis=(1, 2)) for measure, grid in dense.items()}, index=cities
+        ).astype(table.dtypes)
+        monthly = pd.DataFrame(
+            dense["quantity_ordered"].sum(axis=2).T, index=month_labels(calendar_months), columns=cities
+        ).astype("int64")
+        hourly = pd.DataFrame(
+            dense["orders"].sum(axis=1).T, index=np.arange(24), columns=cities
+        ).astype("int64")
+        return totals, monthly, hourly
+
+    def _select(self, city, dates=None):
+        table = self.table
+        if city is not None:
+            try:
+                table = table.xs(city, level="city", drop_level=False)
+            except KeyError:
+                return table.iloc[:0]
+        if dates is None:
+            return table
+        start, end = dates
+        days = table.index.get_level_values("day")
+        if city is None:
+            return table[(days >= start) & (days <= end)]
+        # One city's days are sorted: two binary searches and a slice
+        return table.iloc[days.searchsorted(start):days.searchsorted(end, side="right")]
+
+
+def _months(table):
+    """Month-start date of each row's day, named ``month``."""
+    days = table.index.get_level_values("day")
+    return days.to_period("M").to_timestamp().as_unit(days.unit).rename("month")
@@ -0,0 +1,134 @@
+# grid.py
+"""Server-side paginated, sortable table of the selected city's rows.
+
+Only the visible page is sent to the browser; sorting and filtering run
+on the server against the shared sort orders in ``paging``.
+"""
+import asyncio
+
+from shiny import module, reactive, render, req, ui
+
+from .instrument import carry_cause, timed
+from .paging import PAGE_SIZES, RowOrder
+from .sessions import SESSIONS
+
+SORT_COLUMNS = {
+    "": "File order",
+    "order_date": "Order date",
+    "product": "Product",
+    "quantity_ordered": "Quantity",
+    "price_each": "Price",
+    "value": "Order value",
+    "month": "Month",
+    "hour": "Hour",
+}
+
+
+@module.ui
+def grid_ui():
+    return ui.div(
+        ui.layout_columns(
+            ui.input_select("sort", "Sort by", SORT_COLUMNS),
+            ui.input_checkbox("descending", "Descending"),
+            ui.input_selectize("product", "Product", {"": "All products"}),
+            ui.input_numeric("min_value", "Min order value", None, min=0),
+            ui.input_select("page_size", "Rows per page", [str(n) for n in PAGE_SIZES], selected="50"),
+            col_widths=[3, 2, 3, 2, 2]
+        ),
+        ui.output_table("rows"),
+        ui.div(
+            ui.input_action_button("previous", "Previous", class_="btn-sm"),
+            ui.output_text("status", inline=True),
+            ui.input_action_button("next", "Next", class_="btn-sm"),
+            class_="d-flex align-items-center gap-3"
+        )
+    )
+
+
+@module.server
+def grid_server(input, output, session, view):
+    """``view`` is the session's ``city_view`` calc."""
+    page = reactive.value(0)
+    # Bumped to build the order again after the session released it
+    rebuild = reactive.value(0)
+
+    # Product choices are the same for every city; they are refreshed with
+    # the view, keeping the selection when it's still offered
+    @reactive.effect
+    def _():
+        products = list(view().snapshot.product_ranking.totals.index)
+        with reactive.isolate():
+            selected = input.product()
+        ui.update_selectize(
+            "product",
+            choices={"": "All products", **{p: p for p in products}},
+            selected=selected if selected in products else ""
+        )
+
+    # Sorting a large city takes a while; do it off the event loop
+    @reactive.extended_task
+    async def build_order(snap, city, sort, descending, filters, dates):
+        return await asyncio.to_thread(RowOrder.build, snap, city, sort, descending, filters, dates)
+
+    @reactive.effect
+    def _():
+        city, snap, dates = view()
+        filters = {"value": (input.min_value(), None)}
+        if input.product():
+            filters["product"] = input.product()
+        rebuild()
+        carry_cause()
+        build_order.cancel()
+        build_order.invoke(snap, city, input.sort() or None, input.descending(), filters, dates)
+
+    @reactive.calc
+    @timed
+    def order():
+        # Released when the session idles, rebuilt by ``rows`` on return
+        return SESSIONS.track("order", build_order.result())
+
+    def page_size():
+        return int(input.page_size())
+
+    @reactive.calc
+    @timed
+    def page_count():
+        return order().pages(page_size())
+
+    # A new city, window, sort, filter or page size starts again from the
+    # first page; rebuilding a released order keeps the page
+    @reactive.effect
+    def _():
+        view()
+        input.sort()
+        input.descending()
+        input.product()
+        input.min_value()
+        page_size()
+        page.set(0)
+
+    @reactive.effect
+    @reactive.event(input.previous)
+    def _():
+        page.set(max(page() - 1, 0))
+
+    @reactive.effect
+    @reactive.event(input.next)
+    def _():
+        page.set(min(page() + 1, page_count() - 1))
+
+    @render.table(index=False)
+    @timed
+    def rows():
+        current = order()
+        if current.released:
+            with reactive.isolate():
+                rebuild.set(rebuild() + 1)
+            # Busy until the order is built again
+            req(False)
+        return current.page(page(), page_size())
+
+    @render.text
+    @timed
+    def status():
+        return f"Page {page() + 1:,} of {page_count():,} ({len(order()):,} rows)"
@@ -0,0 +1,149 @@
+# imports.py
+"""Lazy loading of the plotting and mapping libraries, and import timings.
+
+Libraries only a few outputs need are bound with ``lazy("name")`` and
+imported on first attribute access, so a worker is ready to serve before
+altair, seaborn, folium, plotly or matplotlib are loaded. ``preload()``
+then imports them on a background thread shortly after startup, so the
+first render usually finds them loaded anyway.
+
+With ``SALES_IMPORT_REPORT=1`` every module imported after this one is
+timed, and a report of import cost per top-level package is logged when
+the preload starts (startup cost) and when it ends (preload cost).
+``SALES_PRELOAD=0`` turns the preload off.
+"""
+import builtins
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+
+ENABLED = os.environ.get("SALES_IMPORT_REPORT") == "1"
+PRELOAD = os.environ.get("SALES_PRELOAD", "1") != "0"
+# Seconds after startup before preloading, so the server is already listening
+PRELOAD_DELAY = float(os.environ.get("SALES_PRELOAD_DELAY", "2"))
+
+logger = logging.getLogger(__name__)
+if ENABLED and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+
+
+class ImportTimer:
+    """Self time of each first import, recorded through ``builtins.__import__``.
+
+    Self time excludes the imports a module makes itself, so the times add
+    up to the total without double counting.
+    """
+
+    def __init__(self):
+        self.seconds = {}
+        self._stack = threading.local()
+        self._original = None
+
+    def install(self):
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def report(self, n=15):
+        """Text table of the ``n`` costliest top-level packages."""
+        packages = defaultdict(float)
+        for name, seconds in list(self.seconds.items()):
+            packages[name.partition(".")[0]] += seconds
+        rows = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        lines = [f"{name:<24} {seconds * 1000:9.1f} ms" for name, seconds in rows[:n]]
+        lines.append(f"{'total':<24} {sum(packages.values()) * 1000:9.1f} ms in {len(self.seconds)} modules")
+        return "\n".join(lines)
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self._original(name, globals, locals, fromlist, level)
+        stack = self._stack.__dict__.setdefault("children", [])
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return self._original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed - children
+            if stack:
+                stack[-1] += elapsed
+
+
+TIMER = ImportTimer()
+if ENABLED:
+    TIMER.install()
+
+
+def load(name):
+    """Import ``name``, logging how long it took if it wasn't loaded yet."""
+    loaded = name in sys.modules
+    started = time.perf_counter()
+    # Always through __import__: it waits for an import still running on
+    # another thread (such as the preload), and the import timer sees it
+    __import__(name)
+    if not loaded:
+        logger.info("Imported %s in %.0f ms", name, (time.perf_counter() - started) * 1000)
+    return sys.modules[name]
+
+
+class LazyModule:
+    """Stands in for module ``name`` and imports it on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = load(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy(name):
+    """A ``LazyModule`` for ``name``; bind it where ``import name`` would go."""
+    return LazyModule(name)
+
+
+# What the shared chart rendering and the state map load lazily
+CHART_MODULES = ("matplotlib.figure", "matplotlib.backends.backend_agg", "matplotlib.artist", "seaborn")
+MAP_MODULES = ("plotly.express", "plotly.io")
+
+_preloading = set()
+_preload_lock = threading.Lock()
+
+
+def preload(*names, delay=PRELOAD_DELAY):
+    """Import ``names`` on a background thread after ``delay`` seconds.
+
+    Each name is preloaded once per process, however often this is called.
+    """
+    with _preload_lock:
+        names = [name for name in names if name not in _preloading]
+        _preloading.update(names)
+    if not names or not PRELOAD:
+        return
+    threading.Thread(target=_preload, args=(names, delay), name="preload", daemon=True).start()
+
+
+def _preload(names, delay):
+    time.sleep(delay)
+    if ENABLED:
+        logger.info("Startup imports:\n%s", TIMER.report())
+    started = time.perf_counter()
+    for name in names:
+        try:
+            load(name)
+        except ImportError as e:
+            logger.warning("Could not preload %s: %s", name, e)
+    logger.info("Preloaded %d modules in %.1fs", len(names), time.perf_counter() - started)
+    if ENABLED:
+        logger.info("Imports after preload:\n%s", TIMER.report())
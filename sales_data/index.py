@@ -0,0 +1,55 @@
+# index.py
+"""Row ranges of each city in a frame sorted by city."""
+import numpy as np
+
+
+class CityIndex:
+    """Maps each city to the contiguous ``slice`` of rows it occupies.
+
+    The loader sorts rows by city, so a per-city view is an ``iloc`` slice
+    found in O(1) instead of a boolean mask over the whole table.
+    """
+
+    def __init__(self, ranges):
+        self._ranges = ranges
+
+    @classmethod
+    def from_frame(cls, df):
+        city = df["city"].cat
+        codes = city.codes.to_numpy()
+        if len(codes) > 1 and (np.diff(codes) < 0).any():
+            raise ValueError("CityIndex needs a frame sorted by city")
+        counts = np.bincount(codes, minlength=len(city.categories))
+        stops = np.cumsum(counts)
+        return cls({
+            name: slice(int(stop - count), int(stop))
+            for name, count, stop in zip(city.categories, counts, stops)
+            if count
+        })
+
+    @classmethod
+    def from_counts(cls, counts):
+        """An index laid out as if the cities' rows, ``counts[city]`` each,
+        were concatenated in ``counts`` order."""
+        ranges, start = {}, 0
+        for city, count in counts.items():
+            if count:
+                ranges[city] = slice(start, start + count)
+                start += count
+        return cls(ranges)
+
+    def counts(self):
+        """Rows per city, in index order."""
+        return {city: s.stop - s.start for city, s in self._ranges.items()}
+
+    @property
+    def cities(self):
+        """Cities that have at least one row, in category order."""
+        return list(self._ranges)
+
+    def slice(self, city):
+        return self._ranges.get(city, slice(0, 0))
+
+    def size(self, city):
+        s = self.slice(city)
+        return s.stop - s.start
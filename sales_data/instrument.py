@@ -0,0 +1,289 @@
+# instrument.py
+"""Opt-in timing of reactive calcs and render functions.
+
+Set ``SALES_PROFILE=1`` and decorate functions with ``@timed`` beneath
+their ``@reactive.calc`` / ``@render.*`` decorator. Each call's wall time
+is recorded per session, and every reactive flush is logged as one JSON
+line (logger ``sales_data.instrument``) naming the inputs that changed and
+the chain of functions it recomputed. ``perf_panel_ui``/``perf_panel_server``
+add a panel showing the slowest functions, the latest recompute chains
+and what each session holds (see sessions.py). It is rendered only for
+URLs with ``?admin=<token>``, where the token is ``SALES_ADMIN_TOKEN``;
+without that variable nobody sees it.
+
+With profiling off, ``timed`` returns the function unchanged.
+"""
+import functools
+import hmac
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from urllib.parse import parse_qs
+
+from shiny import reactive, render, req, ui
+from shiny.session import get_current_session
+
+from .plot_cache import PLOT_CACHE
+from .rendering import RENDER_POOL
+from .sessions import SESSIONS
+from .warmup import WARMUP
+
+ENABLED = os.environ.get("SALES_PROFILE") == "1"
+# Recompute chains kept per session for the panel
+HISTORY = 20
+ADMIN_TOKEN = os.environ.get("SALES_ADMIN_TOKEN", "")
+# Only hides the panel's frame; what goes in it is checked on the server
+ADMIN_CONDITION = "window.location.search.indexOf('admin=') >= 0"
+
+logger = logging.getLogger(__name__)
+if ENABLED and not logger.handlers:
+    logger.addHandler(logging.StreamHandler())
+    logger.setLevel(logging.INFO)
+if ENABLED and not ADMIN_TOKEN:
+    logger.warning("SALES_ADMIN_TOKEN is not set; the performance panel is not shown")
+
+
+@dataclass
+class Stat:
+    calls: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    cache_hits: int = 0
+
+    def add(self, seconds):
+        self.calls += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+
+
+@dataclass
+class SessionProfile:
+    stats: dict = field(default_factory=dict)
+    cycles: deque = field(default_factory=lambda: deque(maxlen=HISTORY))
+    inputs: dict = field(default_factory=dict)
+    current: list = None
+    cause: list = None
+    # Cause of a cycle that started a task, for the cycle its result starts
+    carried: list = None
+
+
+class Profiler:
+    """Per-session and process-wide timings of instrumented functions."""
+
+    def __init__(self):
+        self.sessions = {}
+        self.totals = {}
+        self._lock = threading.Lock()
+
+    def record(self, session, name, seconds):
+        profile = self._profile(session)
+        if profile.current is None:
+            self._start_cycle(session, profile)
+        profile.current.append((name, seconds))
+        with self._lock:
+            profile.stats.setdefault(name, Stat()).add(seconds)
+            self.totals.setdefault(name, Stat()).add(seconds)
+
+    def record_cache(self, session, name, hit):
+        if session is None or not hit:
+            return
+        with self._lock:
+            self._profile(session).stats.setdefault(name, Stat()).cache_hits += 1
+            self.totals.setdefault(name, Stat()).cache_hits += 1
+
+    def slowest(self, session=None, n=10):
+        """``(name, Stat)`` pairs with the most total time, for one session or all."""
+        stats = self.totals if session is None else self._profile(session).stats
+        with self._lock:
+            return sorted(stats.items(), key=lambda item: item[1].seconds, reverse=True)[:n]
+
+    def cycles(self, session):
+        return list(self._profile(session).cycles)
+
+    def _profile(self, session):
+        profile = self.sessions.get(session.id)
+        if profile is None:
+            profile = self.sessions[session.id] = SessionProfile()
+            session.on_ended(lambda: self.sessions.pop(session.id, None))
+        return profile
+
+    def _start_cycle(self, session, profile):
+        inputs = session.input
+        with reactive.isolate():
+            values = {k: inputs[k]() for k in dir(inputs) if inputs[k].is_set()}
+        changed = [k for k, v in values.items() if profile.inputs.get(k, object()) != v]
+        profile.inputs = values
+        user_changed = [k for k in changed if not k.startswith(".clientdata")]
+        if not profile.cycles and profile.cause is None:
+            profile.cause = ["session start"]
+        else:
+            # No input changed: a task finished, or new data or a timer
+            # invalidated something
+            profile.cause = user_changed or changed or profile.carried or ["data"]
+        profile.carried = None
+        profile.current = []
+        session.on_flushed(lambda: self._end_cycle(session, profile), once=True)
+
+    def carry(self, session):
+        """Give the current cycle's cause to the next one without input changes."""
+        profile = self._profile(session)
+        if profile.current is None:
+            self._start_cycle(session, profile)
+        profile.carried = profile.cause
+
+    def _end_cycle(self, session, profile):
+        chain, profile.current = profile.current or [], None
+        if not chain:
+            return
+        cycle = {
+            "session": session.id,
+            "cause": profile.cause,
+            "seconds": sum(seconds for _, seconds in chain),
+            "chain": [{"name": name, "seconds": round(seconds, 6)} for name, seconds in chain],
+        }
+        profile.cycles.appendleft(cycle)
+        logger.info(json.dumps(cycle))
+
+
+PROFILER = Profiler()
+
+
+def timed(fn):
+    """Record the wall time of every call of ``fn`` when profiling is on.
+
+    The time includes any upstream calcs the call had to recompute.
+    """
+    if not ENABLED:
+        return fn
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _record(name, time.perf_counter() - started)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record(name, time.perf_counter() - started)
+    return wrapper
+
+
+def carry_cause():
+    """Name the current cycle's cause for the next cycle too, unless an
+    input changes first. Call it when invoking an extended task, so the
+    cycle its result recomputes is blamed on what started it."""
+    if not ENABLED:
+        return
+    session = get_current_session()
+    if session is not None:
+        PROFILER.carry(session)
+
+
+def _record(name, seconds):
+    session = get_current_session()
+    if session is not None:
+        PROFILER.record(session, name, seconds)
+
+
+def perf_panel_ui():
+    """Hidden performance panel; empty unless profiling is on."""
+    if not ENABLED:
+        return ui.TagList()
+    return ui.panel_conditional(
+        ADMIN_CONDITION,
+        ui.card(
+            ui.card_header("Performance"),
+            ui.output_ui("perf_panel")
+        )
+    )
+
+
+def perf_panel_server(input, output, session):
+    if not ENABLED:
+        return
+
+    @render.ui
+    def perf_panel():
+        # Timings and every session's memory are for administrators only
+        req(is_admin(session))
+        reactive.invalidate_later(2)
+        return ui.div(
+            ui.h5("Slowest in this session"),
+            _stats_table(PROFILER.slowest(session)),
+            ui.h5("Slowest in this process", class_="mt-3"),
+            _stats_table(PROFILER.slowest()),
+            ui.h5("Recent recompute chains", class_="mt-3"),
+            *[_cycle(c) for c in PROFILER.cycles(session)[:5]],
+            ui.h5("Shared caches", class_="mt-3"),
+            ui.tags.pre(json.dumps({"plot_cache": PLOT_CACHE.stats(), "render_pool": RENDER_POOL.stats()}, indent=2)),
+            ui.h5("Warm-up", class_="mt-3"),
+            ui.tags.pre(json.dumps(WARMUP.progress(), indent=2)),
+            ui.h5("Sessions", class_="mt-3"),
+            ui.tags.pre(json.dumps(SESSIONS.stats(), indent=2)),
+            _sessions_table(SESSIONS.report())
+        )
+
+
+def is_admin(session):
+    """Whether ``session``'s URL carries ``?admin=`` with the admin token."""
+    if not ADMIN_TOKEN:
+        return False
+    with reactive.isolate():
+        search = session.clientdata.url_search() or ""
+    token = parse_qs(search.lstrip("?")).get("admin", [""])[0]
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def _stats_table(rows):
+    header = ui.tags.tr(*[ui.tags.th(h) for h in ("Function", "Calls", "Mean ms", "Max ms", "Total ms", "Cache hits")])
+    body = [
+        ui.tags.tr(
+            ui.tags.td(name),
+            ui.tags.td(stat.calls),
+            ui.tags.td(f"{stat.seconds / stat.calls * 1000:.1f}" if stat.calls else "-"),
+            ui.tags.td(f"{stat.max_seconds * 1000:.1f}"),
+            ui.tags.td(f"{stat.seconds * 1000:.1f}"),
+            ui.tags.td(stat.cache_hits)
+        )
+        for name, stat in rows
+    ]
+    return ui.tags.table(ui.tags.thead(header), ui.tags.tbody(*body), class_="table table-sm")
+
+
+def _sessions_table(rows):
+    header = ui.tags.tr(*[ui.tags.th(h) for h in ("Session", "Idle s", "Held MB", "Largest result", "Releases")])
+    body = [
+        ui.tags.tr(
+            ui.tags.td(row["session"][:8]),
+            ui.tags.td(row["idle_seconds"]),
+            ui.tags.td(f"{row['bytes'] / 1024 / 1024:.1f}"),
+            ui.tags.td(max(row["results"], key=row["results"].get) if row["results"] else "-"),
+            ui.tags.td(row["releases"])
+        )
+        for row in rows
+    ]
+    return ui.tags.table(ui.tags.thead(header), ui.tags.tbody(*body), class_="table table-sm")
+
+
+def _cycle(cycle):
+    steps = " → ".join(f"{step['name']} ({step['seconds'] * 1000:.1f} ms)" for step in cycle["chain"])
+    return ui.p(
+        ui.tags.strong(", ".join(cycle["cause"])),
+        f" — {cycle['seconds'] * 1000:.1f} ms: ",
+        steps,
+        class_="small mb-1"
+    )
@@ -0,0 +1,48 @@
+# maps.py
+"""The state choropleth, built and serialised once per data version."""
+from .imports import lazy
+
+px = lazy("plotly.express")
+pio = lazy("plotly.io")
+
+
+def state_choropleth(state_totals):
+    """Choropleth of ``Snapshot.state_totals``."""
+    state_sales = state_totals.reset_index()
+    fig = px.choropleth(
+        state_sales,
+        locations='state',
+        locationmode="USA-states",
+        color='value',
+        scope="usa",
+        color_continuous_scale="Viridis",
+        labels={'value': 'Total Sales ($)'},
+        title='Sales Distribution by State'
+    )
+    fig.update_layout(
+        margin={"r": 0, "t": 30, "l": 0, "b": 0},
+        geo=dict(
+            scope='usa',
+            showland=True,
+            landcolor='rgb(243, 243, 243)',
+            showframe=False,
+            showcoastlines=True,
+            projection_type='albers usa'
+        )
+    )
+    return fig
+
+
+def state_map(snapshot, dates=None):
+    """A session's own copy of the snapshot's choropleth.
+
+    The figure is built and serialised once per snapshot; each call only
+    parses the JSON, so sessions never share a mutable figure. A ``dates``
+    window gets a figure of its own, rolled up from the cube.
+    """
+    if dates is not None:
+        return state_choropleth(snapshot.cube.by_state(dates))
+    figure_json = snapshot.derive(
+        "state_choropleth", lambda: state_choropleth(snapshot.state_totals).to_json()
+    )
+    return pio.from_json(figure_json)
@@ -0,0 +1,149 @@
+# paging.py
+"""Sorted, filtered windows onto one city's rows for the paginated grid.
+
+Sort orders are argsorts of a city's slice, built once per column and
+city version and shared by every session; only the most recently used
+``SORT_ORDERS`` are kept. A page is then a slice of that order, so its
+cost doesn't depend on how many rows the city has.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .store import RecentResults, date_positions
+
+PAGE_SIZES = (25, 50, 100, 250)
+# Sort orders kept per loaded data, at 4 bytes per row of their city
+SORT_ORDERS = int(os.environ.get("SALES_SORT_ORDERS", "8"))
+
+
+class SortOrders(RecentResults):
+    """The most recently used sort orders of one load of the data."""
+
+    def __init__(self, size=SORT_ORDERS):
+        super().__init__(size)
+
+
+def sort_order(snapshot, city, column):
+    """Positions within ``city``'s rows, ordered by ``column`` ascending.
+
+    The sort is stable, so equal values keep file order.
+    """
+    def build():
+        values = snapshot.city_rows(city)[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            keys = values.cat.codes.to_numpy()
+        else:
+            keys = values.to_numpy()
+        positions = np.argsort(keys, kind="stable")
+        return positions.astype(np.int32) if len(positions) < 2**31 else positions
+    orders = snapshot.derive("sort_orders", SortOrders)
+    return orders.get((city, snapshot.city_version(city), column), build)
+
+
+def row_filter(rows, filters):
+    """Boolean mask over ``rows`` for ``filters``, or None if nothing is filtered.
+
+    ``filters`` maps a column to either a value it must equal or a
+    ``(low, high)`` range, where either end may be None.
+    """
+    mask = None
+    for column, wanted in (filters or {}).items():
+        values = rows[column]
+        if isinstance(wanted, tuple):
+            low, high = wanted
+            if low is None and high is None:
+                continue
+            keep = np.ones(len(values), dtype=bool)
+            if low is not None:
+                keep &= (values >= low).to_numpy()
+            if high is not None:
+                keep &= (values <= high).to_numpy()
+        else:
+            keep = (values == wanted).to_numpy()
+        mask = keep if mask is None else mask & keep
+    return mask
+
+
+class RowOrder:
+    """One city's rows in display order, read a page at a time.
+
+    ``release()`` drops the rows and positions but keeps the length; the
+    owner builds the order again before reading another page (the grid
+    does so on a worker thread). It holds no reference to the snapshot,
+    so a released order doesn't keep old data alive.
+    """
+
+    def __init__(self, rows, positions=None, start=0, stop=None, shared=False):
+        self.rows = rows
+        # None means file order, unfiltered: pages are plain slices of the
+        # rows from ``start`` to ``stop``
+        self.positions = positions
+        # The positions are (a view of) a shared sort order
+        self.shared = shared
+        self.start = start
+        self.stop = len(rows) if stop is None else stop
+        self._length = self.stop - self.start if positions is None else len(positions)
+
+    @classmethod
+    def build(cls, snapshot, city, sort=None, descending=False, filters=None, dates=None):
+        """``dates`` (first day, last day) keeps only rows ordered in that
+        window; as rows are sorted by date within a city, that is a range
+        of positions and the shared sort orders still apply."""
+        rows = snapshot.city_rows(city)
+        start, stop = (0, len(rows)) if dates is None else date_positions(rows, dates)
+        mask = row_filter(rows, filters)
+        shared = False
+        if sort:
+            positions = sort_order(snapshot, city, sort)
+            shared = dates is None and mask is None
+            if dates is not None:
+                positions = positions[(positions >= start) & (positions < stop)]
+            if mask is not None:
+                positions = positions[mask[positions]]
+        elif mask is not None:
+            positions = start + np.flatnonzero(mask[start:stop])
+        elif descending:
+            positions = np.arange(start, stop)
+        else:
+            return cls(rows, start=start, stop=stop)
+        # Reversing the ascending order keeps ties in reverse file order
+        return cls(rows, positions[::-1] if descending else positions, shared=shared)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def released(self):
+        return self.rows is None
+
+    @property
+    def nbytes(self):
+        """Bytes only this order keeps alive, which ``release()`` frees:
+        positions it filtered itself rather than a shared sort order, and
+        streamed ``CityRows`` the shared files no longer cache. Rows in
+        memory are a view of the snapshot's frame and count nothing."""
+        if self.released:
+            return 0
+        owned = 0 if self.positions is None or self.shared else self.positions.nbytes
+        if not isinstance(self.rows, pd.DataFrame) and not self.rows.cached:
+            owned += self.rows.nbytes
+        return owned
+
+    def release(self):
+        """Free the rows and positions."""
+        self.rows = self.positions = None
+
+    def pages(self, size):
+        return max(-(-len(self) // size), 1)
+
+    def page(self, number, size):
+        """Rows of page ``number`` (from 0) of ``size`` rows."""
+        if self.released:
+            raise RuntimeError("The order was released; build it again")
+        start = number * size
+        if self.positions is None:
+            start += self.start
+            return self.rows.iloc[start:min(start + size, self.stop)]
+        return self.rows.iloc[self.positions[start:start + size]]
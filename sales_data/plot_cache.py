@@ -0,0 +1,88 @@
+# plot_cache.py
+"""Process-wide LRU cache of rendered plot images."""
+import os
+import threading
+from collections import OrderedDict
+
+MAX_BYTES = int(os.environ.get("SALES_PLOT_CACHE_MB", "64")) * 1024 * 1024
+# Image size (CSS pixels) used when the output's size isn't known
+DEFAULT_SIZE = (600, 400)
+
+
+class PlotCache:
+    """PNG bytes keyed by everything that affects the picture.
+
+    Keys are tuples ``(output id, city, version, dates, width, height,
+    pixel ratio)``: the output id, the view's ``CityView.key``, then the
+    size. ``sizes()`` reads the last three fields, so the size must come
+    last. Entries are evicted least recently used first once their total
+    size passes ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            png = self._entries.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = png
+            self._size += len(png)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_or_render(self, key, render):
+        """Return the cached PNG for ``key``, calling ``render()`` on a miss."""
+        png = self.get(key)
+        if png is None:
+            png = render()
+            self.put(key, png)
+        return png
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def sizes(self, name):
+        """``(width, height, pixel ratio)`` of the cached images of output
+        ``name``, most recently used last."""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == name]
+        return list(dict.fromkeys(key[-3:] for key in reversed(keys)))[::-1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
+
+
+PLOT_CACHE = PlotCache()
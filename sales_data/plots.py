@@ -0,0 +1,110 @@
+# plots.py
+"""Render charts for Shiny image outputs through the shared plot cache.
+
+With ``SALES_CHART_MODE=client`` the charts made with ``output_chart``,
+``render_chart`` and ``chart`` are instead sent to the browser as
+Vega-Lite specs (see vega.py) and drawn there.
+"""
+import asyncio
+import base64
+from pathlib import Path
+
+from htmltools import HTMLDependency
+from shiny import render, ui
+from shiny.render.renderer import Renderer
+from shiny.session import get_current_session
+
+from . import charts, instrument, vega, vendor
+from .plot_cache import DEFAULT_SIZE, PLOT_CACHE
+from .rendering import RENDER_POOL
+
+VEGA_DEPENDENCIES = [
+    HTMLDependency(name, version, source={"subdir": str(vendor.VENDOR_DIR / name)}, script={"src": script})
+    for name, version, script in vendor.LIBRARIES
+] + [
+    HTMLDependency(
+        "sales-vega-output",
+        "1.0.0",
+        source={"subdir": str(Path(__file__).parent / "www")},
+        script={"src": "vega-output.js"},
+    )
+]
+
+# Renders in progress, so identical requests from several sessions share one
+_inflight = {}
+
+
+class data_image(render.image):
+    """``render.image`` whose ``src`` may already be a ``data:`` URI.
+
+    ``render.image`` expects a file path; cached plots are held in memory.
+    """
+
+    async def transform(self, value):
+        if not value["src"].startswith("data:"):
+            return await super().transform(value)
+        return {k: v for k, v in value.items() if v is not None}
+
+
+class render_vega(Renderer[dict]):
+    """Send the Vega-Lite spec returned by the function to an ``output_vega``."""
+
+    def auto_output_ui(self):
+        return output_vega(self.output_id)
+
+    async def transform(self, value):
+        return value
+
+
+def output_vega(id, height="400px"):
+    """Container drawn into by ``render_vega``, the size of an ``output_plot``."""
+    return ui.div(*VEGA_DEPENDENCIES, id=id, class_="sales-vega-output", style=f"width: 100%; height: {height};")
+
+
+# The chart mode's output and renderer; use them with ``chart``
+output_chart = output_vega if vega.CLIENT else ui.output_plot
+render_chart = render_vega if vega.CLIENT else data_image
+
+
+async def chart(key, name, *args):
+    """Value for a ``render_chart`` output drawing ``name`` from charts.py
+    (or vega.py) with ``args``: a spec in client mode, otherwise a cached
+    image as from ``cached_plot(key, ...)``."""
+    if vega.CLIENT:
+        return getattr(vega, name)(*args)
+    draw = getattr(charts, name)
+    return await cached_plot(key, lambda fig: draw(fig, *args))
+
+
+async def cached_plot(key, draw, alt=None):
+    """Image data for the current output, rendered at most once per size and key.
+
+    ``key`` must identify everything the chart depends on, such as the
+    output id, the city or n, and the data version. The output's size and
+    pixel ratio are added here. ``draw(fig)`` runs on ``RENDER_POOL``, so it
+    must only use data captured beforehand, not reactive reads. Await the
+    result and return it from a ``data_image`` output.
+    """
+    clientdata = get_current_session().clientdata
+    width = int(clientdata.output_width() or DEFAULT_SIZE[0])
+    height = int(clientdata.output_height() or DEFAULT_SIZE[1])
+    pixelratio = clientdata.pixelratio() or 1
+    key = (*key, width, height, pixelratio)
+
+    png = PLOT_CACHE.get(key)
+    if instrument.ENABLED:
+        instrument.PROFILER.record_cache(get_current_session(), key[0], png is not None)
+    if png is None:
+        pending = _inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(RENDER_POOL.render(draw, width, height, pixelratio))
+            _inflight[key] = pending
+            pending.add_done_callback(lambda _: _inflight.pop(key, None))
+        png = await asyncio.shield(pending)
+        PLOT_CACHE.put(key, png)
+    return {
+        "src": "data:image/png;base64," + base64.b64encode(png).decode("ascii"),
+        "width": "100%",
+        "height": "100%",
+        "alt": alt,
+    }
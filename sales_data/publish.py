@@ -0,0 +1,43 @@
+# publish.py
+"""Load the sales CSV once and publish it for ``SALES_MODE=attach`` workers.
+
+    python -m sales_data.publish [--source sales.csv] [--watch SECONDS]
+
+With ``--watch`` the file is checked for changes every SECONDS and each
+new version is published; appended rows are parsed incrementally as in
+the dashboards.
+"""
+import argparse
+import logging
+import time
+
+from .shared import publish, publish_dir
+from .store import DATA_PATH, SalesStore
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--source", default=DATA_PATH, help="sales CSV (default: SALES_CSV)")
+    parser.add_argument("--directory", help="publication directory (default: SALES_PUBLISH_DIR)")
+    parser.add_argument("--watch", type=float, metavar="SECONDS", help="keep publishing new versions")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+
+    directory = args.directory or publish_dir(args.source)
+    store = SalesStore(args.source, mode="memory")
+    published = None
+    while True:
+        snap = store.refresh()
+        if snap.version != published:
+            manifest = publish(snap.frame, directory, snap.version, args.source)
+            logger.info("Published version %d (%d rows) to %s", snap.version, manifest["rows"], directory)
+            published = snap.version
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# rankings.py
+"""Per-product totals, pre-sorted for the top/lowest sellers charts."""
+
+MEASURES = ("quantity_ordered", "value")
+
+
+class ProductRanking:
+    """Total quantity and value per product, sorted once per measure.
+
+    Any top-n or bottom-n request is then a slice, whatever ``n`` is. A
+    ``dates`` window is ranked from the per-(day, product) totals instead,
+    which are a few thousand rows however many orders there are.
+    """
+
+    def __init__(self, daily):
+        self.daily = daily
+        self.totals = totals = daily.groupby(level="product", observed=True, sort=True).sum()
+        # Stable sorts keep nlargest/nsmallest's "first occurrence wins" on ties
+        self._descending = {m: totals[m].sort_values(ascending=False, kind="stable") for m in MEASURES}
+        self._ascending = {m: totals[m].sort_values(kind="stable") for m in MEASURES}
+
+    @classmethod
+    def from_frame(cls, df):
+        keys = [df["order_date"].dt.normalize().rename("day"), df["product"]]
+        daily = df.groupby(keys, observed=True, sort=True)[list(MEASURES)].sum()
+        return cls(daily.astype({"quantity_ordered": "int64"}))
+
+    def merge(self, other):
+        """A ranking covering the rows of both ``self`` and ``other``."""
+        daily = self.daily.add(other.daily, fill_value=0).astype(self.daily.dtypes)
+        return ProductRanking(daily.sort_index())
+
+    def top(self, measure, n, dates=None):
+        """The ``n`` products with the highest ``measure``, as a product/measure frame."""
+        ranked = self._descending[measure] if dates is None else self._window(measure, dates, False)
+        return ranked.iloc[:max(n or 0, 0)].reset_index()
+
+    def bottom(self, measure, n, dates=None):
+        """The ``n`` products with the lowest ``measure``, as a product/measure frame."""
+        ranked = self._ascending[measure] if dates is None else self._window(measure, dates, True)
+        return ranked.iloc[:max(n or 0, 0)].reset_index()
+
+    def _window(self, measure, dates, ascending):
+        start, end = dates
+        days = self.daily.index.get_level_values("day")
+        window = self.daily[measure].iloc[days.searchsorted(start):days.searchsorted(end, side="right")]
+        totals = window.groupby(level="product", observed=True, sort=True).sum()
+        return totals.sort_values(ascending=ascending, kind="stable")
@@ -0,0 +1,96 @@
+# rendering.py
+"""Thread-safe chart rendering on a bounded worker pool.
+
+Charts are drawn on standalone ``matplotlib.figure.Figure`` objects with an
+Agg canvas, never through pyplot, so renders from different sessions do
+not share state and each figure is released as soon as its PNG is written.
+"""
+import asyncio
+import io
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .imports import lazy
+
+# Loaded on the first render (or by the preload), not at startup
+backend_agg = lazy("matplotlib.backends.backend_agg")
+figure = lazy("matplotlib.figure")
+
+DPI = 96
+WORKERS = int(os.environ.get("SALES_RENDER_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+def render_png(draw, width, height, pixelratio=1):
+    """Draw ``draw(fig)`` on a ``width`` x ``height`` CSS-pixel figure and return PNG bytes."""
+    fig = figure.Figure(figsize=(width / DPI, height / DPI), dpi=DPI * pixelratio)
+    backend_agg.FigureCanvasAgg(fig)
+    try:
+        draw(fig)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=DPI * pixelratio)
+        return buf.getvalue()
+    finally:
+        # Break the figure/axes reference cycles now rather than at the next GC
+        fig.clear()
+
+
+class RenderPool:
+    """Runs ``render_png`` on a fixed number of threads and keeps timing stats."""
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._max_queued = 0
+        self._renders = 0
+        self._render_seconds = 0.0
+        self._max_render_seconds = 0.0
+        self._wait_seconds = 0.0
+
+    async def render(self, draw, width, height, pixelratio=1):
+        """Render off the event loop and return the PNG bytes."""
+        submitted = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor, self._run, submitted, draw, width, height, pixelratio
+        )
+
+    def _run(self, submitted, draw, width, height, pixelratio):
+        started = time.perf_counter()
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._wait_seconds += started - submitted
+        try:
+            return render_png(draw, width, height, pixelratio)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._running -= 1
+                self._renders += 1
+                self._render_seconds += elapsed
+                self._max_render_seconds = max(self._max_render_seconds, elapsed)
+
+    def stats(self):
+        with self._lock:
+            renders = self._renders
+            return {
+                "workers": self.workers,
+                "queued": self._queued,
+                "running": self._running,
+                "max_queued": self._max_queued,
+                "renders": renders,
+                "mean_render_seconds": self._render_seconds / renders if renders else 0.0,
+                "max_render_seconds": self._max_render_seconds,
+                "mean_wait_seconds": self._wait_seconds / renders if renders else 0.0,
+            }
+
+
+RENDER_POOL = RenderPool()
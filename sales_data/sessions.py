@@ -0,0 +1,189 @@
+# sessions.py
+"""Per-session memory accounting and release of idle sessions' caches.
+
+Per-session calcs hand their results to ``SESSIONS.track(name, value)``,
+which records the bytes each session keeps alive. A session counts as
+active when one of its inputs changes; redraws caused by new data don't
+count. Every ``SWEEP_SECONDS`` the results of sessions idle for longer
+than ``SALES_SESSION_IDLE_MINUTES`` are released. If all sessions
+together still hold more than ``SALES_SESSION_CACHE_MB``, the least
+recently active ones are released too.
+
+Only what a session alone keeps alive is counted: memory shared with
+other sessions stays whatever the session does. Only results with a
+``release()`` method are released, e.g. the grid's ``paging.RowOrder``.
+The grid builds a released order again on a worker thread when the user
+comes back, so the session sees the same page as before.
+Other results are only counted.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from shiny import reactive
+from shiny.session import get_current_session
+
+IDLE_SECONDS = float(os.environ.get("SALES_SESSION_IDLE_MINUTES", "30")) * 60
+MAX_BYTES = int(os.environ.get("SALES_SESSION_CACHE_MB", "256")) * 1024 * 1024
+# Seconds between checks for idle sessions
+SWEEP_SECONDS = 10
+
+logger = logging.getLogger(__name__)
+
+
+def nbytes(value):
+    """Bytes held by ``value``: pandas and numpy data, objects with an
+    ``nbytes`` attribute, and tuples, lists and dicts of those.
+
+    Objects report only what they own: a grid order doesn't count the
+    shared rows it reads, a view only a snapshot the store has replaced.
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray) or hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, (tuple, list)):
+        return sum(nbytes(item) for item in value)
+    if isinstance(value, dict):
+        return sum(nbytes(item) for item in value.values())
+    return 0
+
+
+@dataclass
+class SessionState:
+    id: str
+    started: float = field(default_factory=time.monotonic)
+    last_active: float = field(default_factory=time.monotonic)
+    # name -> latest tracked result
+    results: dict = field(default_factory=dict)
+    inputs: dict = field(default_factory=dict)
+    releases: int = 0
+
+    def held(self):
+        """Bytes per tracked result."""
+        return {name: nbytes(value) for name, value in self.results.items()}
+
+    def release(self):
+        """Release every releasable result that holds memory of its own;
+        returns the bytes freed."""
+        freed = 0
+        for value in self.results.values():
+            if callable(getattr(value, "release", None)):
+                before = nbytes(value)
+                if not before:
+                    continue
+                value.release()
+                freed += before - nbytes(value)
+        if freed:
+            self.releases += 1
+        return freed
+
+
+class SessionRegistry:
+    """What each open session holds, and the release policy for it."""
+
+    def __init__(self, idle_seconds=IDLE_SECONDS, max_bytes=MAX_BYTES):
+        self.idle_seconds = idle_seconds
+        self.max_bytes = max_bytes
+        self.released_bytes = 0
+        self._sessions = {}
+        self._last_sweep = time.monotonic()
+        self._lock = threading.Lock()
+
+    def track(self, name, value):
+        """Record ``value`` as the current session's result ``name`` and
+        return it, so a calc can end with ``return SESSIONS.track(...)``."""
+        session = get_current_session()
+        if session is not None:
+            # Module sessions share their root's state; keep their names apart
+            self._state(session).results[session.ns(name)] = value
+        return value
+
+    def report(self):
+        """One dict per open session, most recently active first:
+        ``{"session", "idle_seconds", "bytes", "results", "releases"}``."""
+        now = time.monotonic()
+        with self._lock:
+            states = sorted(self._sessions.values(), key=lambda s: s.last_active, reverse=True)
+        rows = []
+        for state in states:
+            held = state.held()
+            rows.append({
+                "session": state.id,
+                "idle_seconds": round(now - state.last_active),
+                "bytes": sum(held.values()),
+                "results": held,
+                "releases": state.releases,
+            })
+        return rows
+
+    def stats(self):
+        with self._lock:
+            states = list(self._sessions.values())
+        return {
+            "sessions": len(states),
+            "bytes": sum(sum(state.held().values()) for state in states),
+            "max_bytes": self.max_bytes,
+            "idle_seconds": self.idle_seconds,
+            "released_bytes": self.released_bytes,
+        }
+
+    def sweep(self, now=None):
+        """Release idle sessions, then the least recently active ones while
+        the total is over ``max_bytes``. The most recent session is kept."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_sweep = now
+            states = sorted(self._sessions.values(), key=lambda s: s.last_active)
+        freed = released = 0
+        for state in states:
+            if now - state.last_active >= self.idle_seconds:
+                freed_now = state.release()
+                freed += freed_now
+                released += bool(freed_now)
+        total = sum(sum(state.held().values()) for state in states)
+        for state in states[:-1]:
+            if total <= self.max_bytes:
+                break
+            freed_now = state.release()
+            total -= freed_now
+            freed += freed_now
+            released += bool(freed_now)
+        if freed:
+            self.released_bytes += freed
+            logger.info("Released %.1f MB from %d sessions", freed / 1024 / 1024, released)
+        return freed
+
+    def _state(self, session):
+        session = session.root_scope()
+        with self._lock:
+            state = self._sessions.get(session.id)
+            if state is None:
+                state = self._sessions[session.id] = SessionState(session.id)
+                session.on_flush(lambda: self._on_flush(session, state), once=False)
+                session.on_ended(lambda: self._end(session.id))
+        return state
+
+    def _on_flush(self, session, state):
+        inputs = session.input
+        with reactive.isolate():
+            values = {k: inputs[k]() for k in dir(inputs) if not k.startswith(".clientdata") and inputs[k].is_set()}
+        now = time.monotonic()
+        if values != state.inputs:
+            state.inputs = values
+            state.last_active = now
+        if now - self._last_sweep >= SWEEP_SECONDS:
+            self.sweep(now)
+
+    def _end(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+SESSIONS = SessionRegistry()
@@ -0,0 +1,79 @@
+# shared.py
+"""One copy of the loaded data for every worker process on a machine.
+
+A publisher process (``python -m sales_data.publish``) loads the CSV and
+writes the derived frame to an Arrow file in ``PUBLISH_DIR``, then points
+``current.json`` at it. Workers started with ``SALES_MODE=attach``
+memory-map the file named there instead of parsing the CSV, so its numeric
+columns are views onto pages the OS shares between all of them. They
+notice a new publication by polling the manifest's mtime, which is as cheap
+as watching the CSV.
+"""
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .cache import cache_dir, read_cache, read_manifest, write_cache, write_manifest
+
+# Attempts to open the current publication, and the first pause between them
+ATTACH_ATTEMPTS = 5
+ATTACH_BACKOFF = 0.05
+
+
+def publish_dir(path):
+    """Default publication directory for the source CSV ``path``."""
+    return Path(os.environ.get("SALES_PUBLISH_DIR") or cache_dir(path) / "published")
+
+
+def publish(frame, directory, version, source=None):
+    """Write ``frame`` as publication ``version`` and make it current.
+
+    Publications other than the new and the previous one are then removed
+    (by file name, as versions restart with the publisher). A worker
+    that read the old manifest can still open the previous file, and one
+    still mapping an older file keeps reading it until it attaches to the
+    new one (except on Windows, where the file stays until no process has
+    it open).
+    """
+    directory = Path(directory)
+    name = f"sales-{version:06d}.arrow"
+    write_cache(directory / name, frame, prune=False)
+    try:
+        previous = read_manifest(directory)["file"]
+    except (OSError, ValueError, KeyError):
+        previous = None
+    manifest = {
+        "file": name,
+        "version": version,
+        "rows": len(frame),
+        "source": str(source) if source else None,
+        "published": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    write_manifest(directory, manifest)
+    _prune(directory, keep=(name, previous))
+    return manifest
+
+
+def attach(directory):
+    """``(manifest, frame)`` of the current publication, memory-mapped."""
+    directory = Path(directory)
+    # The file may be replaced between reading the manifest and opening it
+    for attempt in range(ATTACH_ATTEMPTS):
+        if attempt:
+            time.sleep(ATTACH_BACKOFF * 2 ** (attempt - 1))
+        manifest = read_manifest(directory)
+        frame = read_cache(directory / manifest["file"])
+        if frame is not None:
+            return manifest, frame
+    raise RuntimeError(f"No readable publication in {directory}")
+
+
+def _prune(directory, keep):
+    for path in directory.glob("sales-*.arrow"):
+        if path.name not in keep:
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                # Still memory-mapped by another process on Windows
+                pass
@@ -0,0 +1,102 @@
+# spatial.py
+"""Order quantity binned into lat/long grid cells for the heatmaps."""
+import numpy as np
+
+# Cell sizes in degrees, coarsest first
+LEVELS = (1.0, 0.25, 0.05, 0.01)
+# Levels also kept per day, for date windows; finer cells hold about one
+# order each, so per day they would be as large as the rows
+DAILY_LEVELS = (1.0, 0.25, 0.05)
+# Most cells sent to the browser for one map
+MAX_CELLS = 4000
+
+
+class SpatialBins:
+    """Summed ``quantity_ordered`` per (city, lat cell, long cell) at each
+    of ``LEVELS``.
+
+    Built once per data version. A map then draws at most ``MAX_CELLS``
+    weighted points, however many rows the city has. ``daily`` holds the
+    same sums per (city, day, lat cell, long cell) at ``DAILY_LEVELS``, so
+    a date window is a slice of them; it is None for bins loaded from a
+    snapshot built without them.
+    """
+
+    def __init__(self, levels, daily=None):
+        self.levels = levels
+        self.daily = daily
+
+    @classmethod
+    def from_frame(cls, df):
+        lat = df["lat"].to_numpy()
+        long = df["long"].to_numpy()
+        day = df["order_date"].dt.normalize().rename("day")
+        levels, daily = {}, {}
+        for cell in LEVELS:
+            cells = [np.floor(lat / cell).astype(np.int64), np.floor(long / cell).astype(np.int64)]
+            levels[cell] = _sum(df, [df["city"], *cells], ["city", "lat_cell", "long_cell"])
+            if cell in DAILY_LEVELS:
+                daily[cell] = _sum(df, [df["city"], day, *cells], ["city", "day", "lat_cell", "long_cell"])
+        return cls(levels, daily)
+
+    def merge(self, other):
+        """Bins covering the rows of both ``self`` and ``other``."""
+        daily = None
+        if self.daily is not None and other.daily is not None:
+            daily = {cell: _add(table, other.daily[cell]) for cell, table in self.daily.items()}
+        return SpatialBins({cell: _add(table, other.levels[cell]) for cell, table in self.levels.items()}, daily)
+
+    def points(self, city, max_cells=MAX_CELLS, dates=None):
+        """``[lat, long, quantity]`` rows at cell centres for ``city``, at the
+        finest level that has no more than ``max_cells`` cells, or else at
+        the coarsest level.
+
+        ``dates`` (first day, last day) sums the daily bins over that window,
+        so only ``DAILY_LEVELS`` are offered; the bins must have ``daily``.
+        """
+        if dates is None:
+            cells, select = self.levels, self._select
+        else:
+            cells, select = self.daily, lambda cell, city: self._window(cell, city, dates)
+        for cell in sorted(cells):
+            table = select(cell, city)
+            if len(table) <= max_cells:
+                break
+        else:
+            cell = max(cells)
+            table = select(cell, city)
+        lat_cell = table.index.get_level_values("lat_cell").to_numpy()
+        long_cell = table.index.get_level_values("long_cell").to_numpy()
+        return np.column_stack([
+            (lat_cell + 0.5) * cell,
+            (long_cell + 0.5) * cell,
+            table.to_numpy(dtype=float),
+        ])
+
+    def _select(self, cell, city):
+        table = self.levels[cell]
+        try:
+            return table.xs(city, level="city", drop_level=False)
+        except KeyError:
+            return table.iloc[:0]
+
+    def _window(self, cell, city, dates):
+        table = self.daily[cell]
+        try:
+            table = table.xs(city, level="city", drop_level=False)
+        except KeyError:
+            table = table.iloc[:0]
+        # One city's days are sorted: two binary searches and a slice
+        start, end = dates
+        days = table.index.get_level_values("day")
+        table = table.iloc[days.searchsorted(start):days.searchsorted(end, side="right")]
+        return table.groupby(level=["lat_cell", "long_cell"], sort=True).sum()
+
+
+def _sum(df, keys, names):
+    table = df["quantity_ordered"].groupby(keys, observed=True, sort=True).sum().astype("int64")
+    return table.rename_axis(names)
+
+
+def _add(table, other):
+    return table.add(other, fill_value=0).astype(table.dtype).sort_index()
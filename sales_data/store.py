@@ -0,0 +1,514 @@
+# store.py
+"""Process-wide sales data store shared by every Shiny session.
+
+The CSV is parsed once per process. Sessions read the same frame and are
+told about new data through ``version()``, which is cheap enough to poll.
+When the file only grew, just the appended rows are parsed and merged in.
+With ``SALES_MODE=stream`` the file is read in chunks and only aggregates
+stay in memory (see streaming.py); with ``SALES_MODE=attach`` a published
+copy is memory-mapped instead (see shared.py); with ``SALES_MODE=aggregate``
+only a prebuilt aggregate snapshot is read (see artifact.py).
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from . import artifact
+from .cache import MANIFEST, cache_dir, read_sales_cached
+from .cube import SalesCube, city_states
+from .index import CityIndex
+from .rankings import ProductRanking
+from .shared import attach, publish_dir
+from .spatial import SpatialBins
+from .streaming import CATEGORICAL, CHUNK_ROWS, align_categories, stream_sales
+
+DATA_PATH = os.environ.get("SALES_CSV", "C:/Users/revat/Documents/datasets/sales.csv")
+# "memory" keeps every row in a DataFrame; "stream" keeps only aggregates
+# in memory and the rows on disk (see streaming.py); "attach" maps the
+# frame published by another process (see shared.py); "aggregate" reads
+# only a snapshot built by ``python -m sales_data.build`` (see artifact.py)
+MODE = os.environ.get("SALES_MODE", "memory")
+# Declared in-memory types of the derived columns. ``value`` stays float64
+# (it is summed into totals) and is computed before ``price_each`` shrinks.
+SCHEMA = {
+    "city": "category",
+    "product": "category",
+    "state": "category",
+    "quantity_ordered": "int16",
+    "price_each": "float32",
+    "lat": "float32",
+    "long": "float32",
+    "month": "int8",
+    "hour": "int8",
+    "value": "float64",
+}
+# Bytes at the start of the file checked to tell an append from a rewrite
+HEAD_BYTES = 64 * 1024
+# Windowed heatmaps kept per loaded data, at most ``spatial.MAX_CELLS`` points each
+MAP_WINDOWS = int(os.environ.get("SALES_MAP_WINDOWS", "32"))
+
+logger = logging.getLogger(__name__)
+
+
+def derive_columns(df):
+    """Parse ``order_date``, add the ``month`` and ``hour`` numbers and the
+    ``value`` and ``state`` columns, and apply ``SCHEMA``.
+
+    Rows come back sorted by city and then order date (stable, so file
+    order is kept for equal times), which ``CityIndex`` and date windows
+    rely on.
+    """
+    df["order_date"] = pd.to_datetime(df["order_date"], dayfirst=True)
+    df["month"] = df["order_date"].dt.month
+    df["hour"] = df["order_date"].dt.hour
+    df["value"] = df["quantity_ordered"] * df["price_each"]
+    df["city"] = df["city"].astype("category")
+    # Extracted once per distinct city rather than once per row
+    categories = df["city"].cat.categories
+    df["state"] = df["city"].map(dict(zip(categories, city_states(categories))))
+    return sort_by_city(compact(df))
+
+
+def compact(df):
+    """``df`` with ``SCHEMA`` applied. An integer column whose values don't
+    fit the declared type keeps its current type."""
+    types = {}
+    for column, dtype in SCHEMA.items():
+        if column not in df:
+            continue
+        if dtype != "category" and np.dtype(dtype).kind == "i":
+            info = np.iinfo(dtype)
+            values = df[column]
+            if len(values) and (values.min() < info.min or values.max() > info.max):
+                logger.warning("%s does not fit %s; keeping %s", column, dtype, values.dtype)
+                continue
+        types[column] = dtype
+    return df.astype(types)
+
+
+def memory_report(df):
+    """Per-column dtype and resident size of ``df``, as printable text."""
+    usage = df.memory_usage(index=False, deep=True)
+    lines = [f"{column:<18} {str(df[column].dtype):<10} {usage[column] / 2**20:9.1f} MiB" for column in df]
+    lines.append(f"{'total':<29} {usage.sum() / 2**20:9.1f} MiB for {len(df):,} rows")
+    return "\n".join(lines)
+
+
+def sort_by_city(df):
+    """``df`` sorted by city, then by order date within each city."""
+    order = np.lexsort((df["order_date"].to_numpy(), df["city"].cat.codes.to_numpy()))
+    return df.take(order).reset_index(drop=True)
+
+
+def append_rows(frame, rows):
+    """Append derived ``rows`` to a city-sorted ``frame``.
+
+    Returns the merged frame and ``rows`` recoded to the merged categories,
+    so aggregates built from either can be combined.
+    """
+    rows, categories = align_categories(rows, {c: frame[c].cat.categories for c in CATEGORICAL})
+    frame = frame.assign(**{c: frame[c].cat.set_categories(categories[c]) for c in CATEGORICAL})
+    return sort_by_city(pd.concat([frame, rows], ignore_index=True)), rows
+
+
+def date_positions(rows, dates):
+    """``(start, stop)`` positions of the ``dates`` window in date-sorted ``rows``."""
+    start, end = dates
+    order_dates = rows["order_date"].to_numpy()
+    return (
+        int(order_dates.searchsorted(np.datetime64(start))),
+        int(order_dates.searchsorted(np.datetime64(end + pd.Timedelta(days=1)))),
+    )
+
+
+class _Prefix(io.RawIOBase):
+    """The first ``limit`` bytes of a binary file."""
+
+    def __init__(self, f, limit):
+        self._f = f
+        self._left = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._f.readinto(memoryview(b)[:self._left]) if self._left else 0
+        self._left -= n
+        return n
+
+
+def read_sales(path, size=None):
+    """Parse and derive the first ``size`` bytes (default: all) of the CSV."""
+    if size is None:
+        return derive_columns(pd.read_csv(path))
+    with open(path, "rb") as f:
+        return derive_columns(pd.read_csv(io.BufferedReader(_Prefix(f, size))))
+
+
+def read_sales_chunks(path, size=None, chunk_rows=CHUNK_ROWS):
+    """Like ``read_sales`` but yields derived frames of at most ``chunk_rows`` rows."""
+    with open(path, "rb") as f:
+        source = f if size is None else io.BufferedReader(_Prefix(f, size))
+        with pd.read_csv(source, chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield derive_columns(chunk)
+
+
+def load_sales(path, size=None):
+    """Like ``read_sales`` but served from the columnar cache when possible."""
+    return read_sales_cached(path, read_sales, size)
+
+
+def head_digest(path, size):
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(min(size, HEAD_BYTES)), digest_size=16).hexdigest()
+
+
+class RecentResults:
+    """The ``size`` most recently used results of one load of the data.
+
+    Keys hold city versions rather than the snapshot, so the results stay
+    valid when rows are appended to other cities and ``Snapshot.append``
+    passes the same instance on to the new snapshot.
+    """
+
+    by_city_version = True
+
+    def __init__(self, size):
+        self.size = size
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """The result for ``key``, building it with ``build()`` if it isn't kept."""
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        result = build()
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.size:
+                self._results.popitem(last=False)
+        return result
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return sum(result.nbytes for result in self._results.values())
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """One loaded version of the data. Treat ``frame`` as read-only.
+
+    Anything computed from the frame is memoised per snapshot via ``derive``,
+    so it is built once per data version and shared by every session.
+
+    ``offset`` is how many bytes of the file the snapshot covers. Appended
+    rows bump the version of only the cities they touch, recorded in
+    ``city_versions``; other cities keep ``base_version``, the version of
+    the last full load.
+
+    In streaming mode ``frame`` is None: the aggregates are built while
+    loading and ``rows`` (a ``CityFiles``) serves each city's rows from disk.
+    In aggregate mode ``frame`` is None too: the aggregates come from a
+    prebuilt snapshot and ``rows`` serves the grid's rows.
+    """
+    version: int
+    frame: pd.DataFrame
+    signature: tuple
+    offset: int = 0
+    head: str = ""
+    appendable: bool = False
+    base_version: int = 0
+    city_versions: dict = field(default_factory=dict)
+    rows: object = None
+    _derived: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+    # Reentrant: an artifact may be built from other artifacts
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+
+    def derive(self, name, build):
+        """Return the artifact ``name``, building it with ``build()`` on first use."""
+        try:
+            return self._derived[name]
+        except KeyError:
+            pass
+        with self._lock:
+            if name not in self._derived:
+                self._derived[name] = build()
+            return self._derived[name]
+
+    def city_version(self, city):
+        """Version at which ``city``'s rows last changed."""
+        return self.city_versions.get(city, self.base_version)
+
+    @property
+    def cube(self):
+        return self.derive("cube", lambda: SalesCube.from_frame(self.frame))
+
+    @property
+    def city_index(self):
+        return self.derive("city_index", lambda: CityIndex.from_frame(self.frame))
+
+    @property
+    def product_ranking(self):
+        return self.derive("product_ranking", lambda: ProductRanking.from_frame(self.frame))
+
+    @property
+    def spatial_bins(self):
+        return self.derive("spatial_bins", lambda: SpatialBins.from_frame(self.frame))
+
+    @property
+    def state_totals(self):
+        """Total ``value`` per state, rolled up from the cube."""
+        return self.derive("state_totals", lambda: self.cube.by_state())
+
+    @property
+    def date_bounds(self):
+        """First and last order day, as midnight timestamps."""
+        return self.derive("date_bounds", lambda: self.cube.date_bounds)
+
+    @property
+    def nbytes(self):
+        """Bytes of the rows held in memory; streamed and aggregate rows
+        stay in their files."""
+        return 0 if self.frame is None else int(self.frame.memory_usage(deep=False).sum())
+
+    def prepare(self):
+        """Build the shared artifacts now, so later reads don't block. Safe
+        from any thread. A city's rows are only read when first asked for."""
+        for name in ("city_index", "cube", "product_ranking", "spatial_bins", "state_totals"):
+            getattr(self, name)
+
+    def city_rows(self, city, dates=None):
+        """Rows for one city as a slice of the shared frame (no mask, no
+        copy), or in streaming and aggregate mode as ``CityRows`` over the
+        mapped files (or a slice of the sample).
+
+        ``dates`` (first day, last day) narrows the slice with two binary
+        searches, as a city's rows are sorted by order date.
+        """
+        if self.rows is not None:
+            rows = self.rows.city_rows(city)
+        else:
+            rows = self.frame.iloc[self.city_index.slice(city)]
+        if dates is None:
+            return rows
+        return rows.iloc[slice(*date_positions(rows, dates))]
+
+    def spatial_points(self, city, dates=None):
+        """Heatmap points for ``city``; a date window sums the daily bins.
+
+        Bins without daily sums (an aggregate snapshot built before they
+        were kept) give every date; check ``spatial_windows``.
+        """
+        if dates is None or not self.spatial_windows:
+            return self.spatial_bins.points(city)
+        # Every session drawing this window shares one result
+        windows = self.derive("map_windows", lambda: RecentResults(MAP_WINDOWS))
+        return windows.get(
+            (city, self.city_version(city), dates), lambda: self.spatial_bins.points(city, dates=dates)
+        )
+
+    @property
+    def spatial_windows(self):
+        """Whether ``spatial_points`` honours a date window."""
+        return self.spatial_bins.daily is not None
+
+    def append(self, rows, signature, offset):
+        """A new snapshot with ``rows`` (already derived) appended.
+
+        Artifacts that know how to ``merge`` are updated from ``rows`` alone
+        and those keyed ``by_city_version`` are kept as they are; the rest
+        are rebuilt lazily from the merged frame.
+        """
+        if self.rows is None:
+            files = None
+            frame, rows = append_rows(self.frame, rows)
+        else:
+            frame = None
+            files, rows = self.rows.append(rows)
+        version = self.version + 1
+        touched = {city: version for city in rows["city"].unique()}
+        snap = Snapshot(
+            version, frame, signature, offset, self.head, True,
+            self.base_version, {**self.city_versions, **touched}, files
+        )
+        for name, derived in list(self._derived.items()):
+            if hasattr(derived, "merge"):
+                snap._derived[name] = derived.merge(type(derived).from_frame(rows))
+            elif getattr(derived, "by_city_version", False):
+                snap._derived[name] = derived
+        if files is not None:
+            snap._derived["city_index"] = files.city_index()
+        elif "city_index" in self._derived:
+            # The merged frame is still sorted by city: shift the ranges
+            # rather than scan the frame again
+            counts = self.city_index.counts()
+            added = rows["city"].value_counts()
+            snap._derived["city_index"] = CityIndex.from_counts({
+                city: counts.get(city, 0) + int(added[city]) for city in frame["city"].cat.categories
+            })
+        return snap
+
+
+class SalesStore:
+    def __init__(self, path=DATA_PATH, check_interval=5.0, mode=MODE):
+        self.path = path
+        self.check_interval = check_interval
+        self.mode = mode
+        # In attach and aggregate mode changes are announced by a manifest
+        if mode == "attach":
+            self.watched = publish_dir(path) / MANIFEST
+        elif mode == "aggregate":
+            self.watched = artifact.snapshot_dir(path) / MANIFEST
+        else:
+            self.watched = path
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._last_check = 0.0
+
+    def signature(self):
+        """``(mtime, size)`` of the source file, used to detect changes."""
+        st = os.stat(self.watched)
+        return st.st_mtime_ns, st.st_size
+
+    def snapshot(self):
+        snap = self._snapshot
+        if snap is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load(1)
+                snap = self._snapshot
+        return snap
+
+    def current(self):
+        """The latest snapshot, or None before the first load."""
+        return self._snapshot
+
+    def frame(self):
+        return self.snapshot().frame
+
+    def version(self):
+        """Current data version; also kicks off a background refresh if the file changed.
+
+        Meant to be used as a ``reactive.poll`` function, so it must stay cheap.
+        """
+        snap = self.snapshot()
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._maybe_refresh(snap)
+        return snap.version
+
+    def reload(self):
+        """Re-read the whole file now and swap in the new version."""
+        with self._lock:
+            current = self._snapshot
+            self._snapshot = self._load(current.version + 1 if current else 1)
+            return self._snapshot
+
+    def refresh(self):
+        """Pick up changes to the file: parse only appended rows when the file
+        just grew, otherwise reload it in full."""
+        with self._lock:
+            current = self._snapshot
+            if current is None:
+                self._snapshot = self._load(1)
+                return self._snapshot
+            signature = self.signature()
+            if signature == current.signature:
+                return current
+            appended = self._read_appended(current, signature[1])
+            if appended is None:
+                self._snapshot = self._load(current.version + 1)
+            else:
+                rows, offset = appended
+                if len(rows):
+                    self._snapshot = current.append(rows, signature, offset)
+            return self._snapshot
+
+    def _load(self, version):
+        signature = self.signature()
+        if self.mode == "attach":
+            # Not appendable: every publication is attached in full
+            _, frame = attach(self.watched.parent)
+            return Snapshot(version, frame, signature, base_version=version)
+        if self.mode == "aggregate":
+            return self._load_aggregates(version, signature)
+        size = signature[1]
+        with open(self.path, "rb") as f:
+            f.seek(max(size - 1, 0))
+            # An unterminated last line may still be being written; appending
+            # after it isn't safe, so the next change forces a full reload
+            appendable = f.read(1) == b"\n"
+        head = head_digest(self.path, size)
+        if self.mode == "stream":
+            files, artifacts = stream_sales(read_sales_chunks(self.path, size), cache_dir(self.path))
+            snap = Snapshot(version, None, signature, size, head, appendable, version, rows=files)
+            snap._derived.update(artifacts)
+            return snap
+        frame = load_sales(self.path, size)
+        logger.info("Loaded %s\n%s", self.path, memory_report(frame))
+        return Snapshot(version, frame, signature, size, head, appendable, version)
+
+    def _load_aggregates(self, version, signature):
+        manifest, artifacts, sample = artifact.load_snapshot(self.watched.parent)
+        if sample is not None:
+            rows = artifact.SampleRows(sample)
+        else:
+            rows = artifact.RawRows(lambda: read_sales_chunks(self.path), cache_dir(self.path))
+        snap = Snapshot(version, None, signature, base_version=version, rows=rows)
+        snap._derived.update(artifacts)
+        logger.info(
+            "Loaded aggregate snapshot %d of %s (%d rows, %d sampled)",
+            manifest["version"], manifest["source"], manifest["rows"], manifest["sample_rows"]
+        )
+        return snap
+
+    def _read_appended(self, snap, size):
+        """``(rows, offset)`` appended since ``snap``, or None if the file
+        changed in some other way. Only complete lines are consumed."""
+        if not snap.appendable or size <= snap.offset:
+            return None
+        if head_digest(self.path, snap.offset) != snap.head:
+            return None
+        with open(self.path, "rb") as f:
+            header = f.readline()
+            f.seek(snap.offset)
+            data = f.read(size - snap.offset)
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return pd.DataFrame(), snap.offset
+        rows = derive_columns(pd.read_csv(io.BytesIO(header + data[:end])))
+        return rows, snap.offset + end
+
+    def _maybe_refresh(self, snap):
+        try:
+            changed = self.signature() != snap.signature
+        except OSError:
+            # File is being replaced; keep serving the current version
+            return
+        if changed and not self._reloading:
+            self._reloading = True
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            self._reloading = False
+
+
+STORE = SalesStore()
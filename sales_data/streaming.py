@@ -0,0 +1,294 @@
+# streaming.py
+"""Out-of-core mode: aggregates in memory, raw rows on disk.
+
+The CSV is read in bounded chunks. Each chunk is folded into the cube,
+product ranking and spatial bins (all of which ``merge``), and its rows
+are written to one Arrow file per city. Memory use then depends on the
+chunk size and the number of distinct keys, not on the number of rows.
+A city's raw rows are only mapped when the data grid asks for them, and
+then read a column or a page at a time (see ``CityRows``). Requires
+pyarrow.
+"""
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+try:
+    import psutil
+except ImportError:  # pragma: no cover - optional dependency
+    psutil = None
+
+from .cube import SalesCube
+from .index import CityIndex
+from .rankings import ProductRanking
+from .spatial import SpatialBins
+
+CHUNK_ROWS = int(os.environ.get("SALES_CHUNK_ROWS", 1_000_000))
+# Columns stored as categoricals; on disk they are codes into ``categories``
+CATEGORICAL = ("city", "product", "state")
+# Cities whose mapped rows are kept open after being read back
+CACHED_CITIES = 2
+AGGREGATES = (SalesCube, ProductRanking, SpatialBins)
+
+
+def align_categories(rows, categories):
+    """Recode the categorical columns of ``rows`` onto ``categories``
+    (``{column: Index}``), extending them with any new values.
+
+    Returns the recoded rows and the extended categories.
+    """
+    categories = dict(categories)
+    for column in CATEGORICAL:
+        known = categories.get(column)
+        if known is None:
+            known = rows[column].cat.categories
+        else:
+            known = known.append(rows[column].cat.categories.difference(known))
+        categories[column] = known
+        rows = rows.assign(**{column: rows[column].cat.set_categories(known)})
+    return rows, categories
+
+
+class _Directory:
+    """A directory removed once no ``CityFiles`` refers to it.
+
+    Directories left behind by processes that were killed are removed the
+    next time one is created.
+    """
+
+    def __init__(self, parent):
+        Path(parent).mkdir(parents=True, exist_ok=True)
+        _remove_orphans(Path(parent))
+        self.path = Path(tempfile.mkdtemp(prefix=f"rows-{os.getpid()}-", dir=parent))
+        self._names = itertools.count()
+        weakref.finalize(self, shutil.rmtree, self.path, True)
+
+    def new_file(self):
+        return self.path / f"{next(self._names):06d}.arrow"
+
+
+def _remove_orphans(parent):
+    for path in parent.glob("rows-*-*"):
+        try:
+            pid = int(path.name.split("-")[1])
+        except ValueError:
+            # Not ours
+            continue
+        if not _running(pid):
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _running(pid):
+    """Whether process ``pid`` may still be running."""
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    if os.name == "nt":
+        # Signal 0 is CTRL_C_EVENT there, not a probe; without psutil the
+        # directory is kept
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # A live process we may not signal
+        pass
+    return True
+
+
+class CityFiles:
+    """Each city's derived rows as Arrow files, in file order.
+
+    Immutable: appending returns a new ``CityFiles`` with an extra file per
+    touched city, so snapshots still being read are unaffected.
+    """
+
+    def __init__(self, directory, parts, counts, categories):
+        self.directory = directory
+        self.parts = parts
+        self.counts = counts
+        self.categories = categories
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def city_index(self):
+        """A ``CityIndex`` laid out as if the cities' rows were concatenated."""
+        return CityIndex.from_counts({city: self.counts.get(city, 0) for city in self.categories["city"]})
+
+    def city_rows(self, city):
+        """All rows of ``city`` as ``CityRows`` (the latest few are kept)."""
+        with self._lock:
+            if city in self._cache:
+                self._cache.move_to_end(city)
+                return self._cache[city]
+        rows = self._read(city)
+        with self._lock:
+            self._cache[city] = rows
+            while len(self._cache) > CACHED_CITIES:
+                self._cache.popitem(last=False)[1].cached = False
+        return rows
+
+    def append(self, rows):
+        """New files for ``rows`` (derived). Returns ``(files, aligned rows)``."""
+        rows, categories = align_categories(rows, self.categories)
+        parts, counts = dict(self.parts), dict(self.counts)
+        for city, group in rows.groupby("city", observed=True, sort=False):
+            target = self.directory.new_file()
+            table = _table(group)
+            with pa.OSFile(str(target), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            parts[city] = parts.get(city, ()) + (target,)
+            counts[city] = counts.get(city, 0) + len(group)
+        return CityFiles(self.directory, parts, counts, categories), rows
+
+    def _read(self, city):
+        tables = []
+        for target in self.parts.get(city, ()):
+            with pa.memory_map(str(target), "r") as source:
+                tables.append(pa.ipc.open_file(source).read_all())
+        if not tables:
+            raise KeyError(city)
+        # Appends are inferred separately; keep the first file's types
+        schema = tables[0].schema
+        return CityRows(pa.concat_tables([t if t.schema == schema else t.cast(schema) for t in tables]), self.categories)
+
+
+class CityRows:
+    """One city's rows, left in the memory-mapped Arrow files.
+
+    Stands in for the city's slice of a DataFrame where the grid and date
+    windows read it: ``len(rows)``, ``rows[column]`` reads one column as a
+    Series and ``rows.iloc[...]`` a few rows as a DataFrame. Nothing else
+    is read into memory.
+
+    Each chunk and append is sorted by date on its own, while windows need
+    the city's rows sorted as a whole. If they aren't, ``order`` holds the
+    positions in date order and every read goes through it.
+    """
+
+    def __init__(self, table, categories):
+        self.table = table
+        self.categories = categories
+        self.order = None
+        # False once CityFiles evicts it: then only its holders keep it alive
+        self.cached = True
+        self.iloc = _RowIndexer(self)
+        dates = self._column("order_date")
+        if len(dates) > 1 and (dates[1:] < dates[:-1]).any():
+            order = np.argsort(dates, kind="stable")
+            self.order = order.astype(np.int32) if len(order) < 2**31 else order
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __getitem__(self, column):
+        values = self._column(column)
+        if self.order is not None:
+            values = values[self.order]
+        if column in CATEGORICAL:
+            values = pd.Categorical.from_codes(values, self.categories[column])
+        return pd.Series(values, name=column)
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory rather than mapped: the date order, if any."""
+        return 0 if self.order is None else self.order.nbytes
+
+    def take(self, positions):
+        """Rows at ``positions`` (in date order), as a DataFrame."""
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.order is not None:
+            positions = self.order[positions]
+        return self._frame(self.table.take(pa.array(positions)))
+
+    def slice(self, start, stop):
+        """Rows ``start`` to ``stop`` (in date order), as a DataFrame."""
+        if self.order is not None:
+            return self.take(np.arange(start, stop))
+        return self._frame(self.table.slice(start, max(stop - start, 0)))
+
+    def _frame(self, table):
+        rows = table.to_pandas()
+        return rows.assign(**{
+            column: pd.Categorical.from_codes(rows[column], self.categories[column])
+            for column in CATEGORICAL
+        })
+
+    def _column(self, name):
+        return self.table.column(name).to_numpy()
+
+
+class _RowIndexer:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self._rows))
+            if step == 1:
+                return self._rows.slice(start, stop)
+            key = np.arange(start, stop, step)
+        return self._rows.take(key)
+
+
+def _table(rows):
+    codes = {column: rows[column].cat.codes.astype("int32") for column in CATEGORICAL}
+    return pa.Table.from_pandas(rows.assign(**codes), preserve_index=False)
+
+
+def stream_sales(chunks, directory):
+    """Fold derived, city-sorted ``chunks`` into aggregates and city files.
+
+    Returns ``(files, artifacts)`` where ``artifacts`` maps snapshot
+    artifact names to the aggregates built from every chunk.
+    """
+    if pa is None:
+        raise RuntimeError("Streaming mode needs pyarrow")
+    root = _Directory(directory)
+    writers, sinks, schemas, parts, counts, categories = {}, {}, {}, {}, {}, {}
+    aggregates = {}
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            chunk, categories = align_categories(chunk, categories)
+            for aggregate in AGGREGATES:
+                built = aggregate.from_frame(chunk)
+                current = aggregates.get(aggregate)
+                aggregates[aggregate] = built if current is None else current.merge(built)
+            for city, group in chunk.groupby("city", observed=True, sort=False):
+                table = _table(group)
+                if city not in writers:
+                    parts[city] = (root.new_file(),)
+                    sinks[city] = pa.OSFile(str(parts[city][0]), "wb")
+                    writers[city] = pa.ipc.new_file(sinks[city], table.schema)
+                    schemas[city] = table.schema
+                # Every chunk is inferred separately; keep the first chunk's types
+                writers[city].write_table(table.cast(schemas[city]))
+                counts[city] = counts.get(city, 0) + len(group)
+    finally:
+        for city, writer in writers.items():
+            writer.close()
+            sinks[city].close()
+    files = CityFiles(root, parts, counts, categories)
+    artifacts = {
+        "cube": aggregates[SalesCube],
+        "product_ranking": aggregates[ProductRanking],
+        "spatial_bins": aggregates[SpatialBins],
+        "city_index": files.city_index(),
+    }
+    return files, artifacts
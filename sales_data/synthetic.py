@@ -0,0 +1,147 @@
+# synthetic.py
+"""Generate schema-compatible synthetic sales datasets.
+
+    python -m sales_data.synthetic sales.csv --rows 1000000
+
+Rows follow the source file's columns (order_date, city, product,
+quantity_ordered, price_each, lat, long) with skewed city and product
+popularity, a lunchtime/evening hour profile and dates written
+day-first like the real data. Large files are written in chunks, so
+100M rows need no more memory than one chunk.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - optional dependency
+    pa_csv = None
+
+# city: (relative share of orders, lat, long)
+CITIES = {
+    "San Francisco (CA)": (24, 37.7749, -122.4194),
+    "Los Angeles (CA)": (16, 34.0522, -118.2437),
+    "New York City (NY)": (13, 40.7128, -74.0060),
+    "Boston (MA)": (11, 42.3601, -71.0589),
+    "Atlanta (GA)": (8, 33.7490, -84.3880),
+    "Dallas (TX)": (8, 32.7767, -96.7970),
+    "Seattle (WA)": (8, 47.6062, -122.3321),
+    "Portland (OR)": (5, 45.5152, -122.6784),
+    "Austin (TX)": (5, 30.2672, -97.7431),
+    "Portland (ME)": (2, 43.6591, -70.2568),
+}
+
+# product: (relative share of orders, price, max quantity per order)
+PRODUCTS = {
+    "USB-C Charging Cable": (22, 11.95, 4),
+    "Lightning Charging Cable": (22, 14.95, 4),
+    "AAA Batteries (4-pack)": (21, 2.99, 9),
+    "AA Batteries (4-pack)": (21, 3.84, 9),
+    "Wired Headphones": (19, 11.99, 4),
+    "Apple Airpods Headphones": (16, 150.00, 2),
+    "Bose SoundSport Headphones": (14, 99.99, 2),
+    "27in FHD Monitor": (8, 149.99, 2),
+    "iPhone": (7, 700.00, 1),
+    "27in 4K Gaming Monitor": (6, 389.99, 1),
+    "34in Ultrawide Monitor": (6, 379.99, 1),
+    "Google Phone": (6, 600.00, 1),
+    "Flatscreen TV": (5, 300.00, 1),
+    "Macbook Pro Laptop": (5, 1700.00, 1),
+    "ThinkPad Laptop": (4, 999.99, 1),
+    "20in Monitor": (4, 109.99, 1),
+    "Vareebadd Phone": (2, 400.00, 1),
+    "LG Washing Machine": (1, 600.00, 1),
+    "LG Dryer": (1, 600.00, 1),
+}
+
+# Relative order volume for each hour of the day
+HOUR_WEIGHTS = np.array([
+    4, 2, 1, 1, 1, 2, 4, 7, 10, 13, 15, 17,
+    18, 17, 15, 14, 14, 15, 17, 19, 19, 17, 13, 8,
+], dtype=float)
+
+CHUNK_ROWS = 1_000_000
+START = pd.Timestamp("2019-01-01")
+DAYS = 365
+# Spread of order locations around each city centre, in degrees
+JITTER = 0.15
+
+
+def _probabilities(weights):
+    weights = np.asarray(weights, dtype=float)
+    return weights / weights.sum()
+
+
+def generate_chunk(rows, rng, start=START, days=DAYS):
+    """One DataFrame of ``rows`` synthetic orders with the raw CSV columns."""
+    city_names = list(CITIES)
+    city_info = np.array([CITIES[c] for c in city_names])
+    product_names = list(PRODUCTS)
+    product_info = np.array([PRODUCTS[p] for p in product_names])
+
+    city = rng.choice(len(city_names), rows, p=_probabilities(city_info[:, 0]))
+    product = rng.choice(len(product_names), rows, p=_probabilities(product_info[:, 0]))
+    max_quantity = product_info[product, 2].astype(np.int64)
+    # Most orders are for one item; multiples mostly for cheap products
+    quantity = 1 + np.minimum(rng.geometric(0.7, rows) - 1, max_quantity - 1)
+
+    day = rng.integers(0, days, rows)
+    hour = rng.choice(24, rows, p=_probabilities(HOUR_WEIGHTS))
+    minute = rng.integers(0, 60, rows)
+    # Formatting a few hundred distinct days and 1440 times beats strftime per row
+    dates = pd.date_range(start, periods=days).strftime("%d/%m/%Y ").to_numpy(dtype=object)
+    times = np.array([f"{h:02d}:{m:02d}" for h in range(24) for m in range(60)], dtype=object)
+
+    return pd.DataFrame({
+        "order_date": dates[day] + times[hour * 60 + minute],
+        "city": np.asarray(city_names, dtype=object)[city],
+        "product": np.asarray(product_names, dtype=object)[product],
+        "quantity_ordered": quantity,
+        "price_each": product_info[product, 1],
+        "lat": (city_info[city, 1] + rng.normal(0, JITTER, rows)).round(5),
+        "long": (city_info[city, 2] + rng.normal(0, JITTER, rows)).round(5),
+    })
+
+
+def _write_chunk(df, f, header):
+    if pa_csv is None:
+        df.to_csv(f, header=header, index=False)
+        return
+    # Arrow's CSV writer is several times faster than to_csv for floats
+    options = pa_csv.WriteOptions(include_header=header, quoting_style="needed")
+    pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), f, options)
+
+
+def generate(path, rows, seed=0, chunk_rows=CHUNK_ROWS, days=DAYS):
+    """Write ``rows`` synthetic orders to the CSV at ``path``. With no
+    rows the file has just the header."""
+    if rows < 0 or chunk_rows < 1:
+        raise ValueError("rows must be >= 0 and chunk_rows >= 1")
+    rng = np.random.default_rng(seed)
+    with open(path, "wb") as f:
+        n = min(chunk_rows, rows)
+        _write_chunk(generate_chunk(n, rng, days=days), f, header=True)
+        written = n
+        while written < rows:
+            n = min(chunk_rows, rows - written)
+            _write_chunk(generate_chunk(n, rng, days=days), f, header=False)
+            written += n
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", help="CSV file to write")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=DAYS, help="span of order dates from 2019-01-01")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+    generate(args.path, args.rows, args.seed, args.chunk_rows, args.days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# vega.py
+"""Vega-Lite specs of the dashboard charts, drawn in the browser.
+
+Each function mirrors the matplotlib drawing of the same name in
+charts.py, but returns a spec with the aggregated series inlined (a few
+dozen values) instead of being rasterised on the server.
+``SALES_CHART_MODE=client`` switches the dashboards to these, as long
+as the Vega scripts are in www/vendor (see vendor.py).
+"""
+import logging
+import os
+
+from . import vendor
+
+logger = logging.getLogger(__name__)
+
+CHART_MODE = os.environ.get("SALES_CHART_MODE", "server")
+CLIENT = CHART_MODE == "client"
+if CLIENT and vendor.missing():
+    logger.warning(
+        "Drawing charts on the server: %s missing; run python -m sales_data.vendor",
+        ", ".join(map(str, vendor.missing()))
+    )
+    CLIENT = False
+SCHEMA = "https://vega.github.io/schema/vega-lite/v5.json"
+
+
+def monthly_orders(monthly, city):
+    """Bar chart of quantity ordered per month; ``monthly`` is ``SalesCube.by_month``."""
+    values = [
+        {"month": month, "quantity_ordered": int(quantity)}
+        for month, quantity in zip(monthly["month_name"], monthly["quantity_ordered"])
+    ]
+    return _spec(
+        f"Sales over Time -- {city}",
+        values,
+        mark="bar",
+        encoding={
+            "x": {"field": "month", "type": "nominal", "sort": None, "title": "Month", "axis": {"labelAngle": -45}},
+            "y": {"field": "quantity_ordered", "type": "quantitative", "title": "Number of Orders"},
+            "tooltip": [{"field": "month"}, {"field": "quantity_ordered", "type": "quantitative"}],
+        },
+    )
+
+
+def hourly_orders(counts, city):
+    """Single-column heatmap of order counts for each of the 24 hours."""
+    values = [{"hour": f"{hour}:00", "orders": int(orders)} for hour, orders in enumerate(counts)]
+    return _spec(
+        f"Number of Orders by Hour of Day in {city}",
+        values,
+        encoding={
+            "y": {"field": "hour", "type": "ordinal", "sort": None, "title": "Hour of Day"},
+        },
+        layer=[
+            {
+                "mark": "rect",
+                "encoding": {
+                    "color": {
+                        "field": "orders",
+                        "type": "quantitative",
+                        "scale": {"scheme": "redblue", "reverse": True},
+                        "legend": None,
+                    },
+                    "tooltip": [{"field": "hour"}, {"field": "orders", "type": "quantitative", "title": "Order Count"}],
+                },
+            },
+            {"mark": {"type": "text", "fontSize": 9}, "encoding": {"text": {"field": "orders"}}},
+        ],
+    )
+
+
+def product_bars(ranked, measure, title, ylabel):
+    """Bar chart of one ``ProductRanking`` slice."""
+    values = [
+        {"product": str(product), measure: round(float(total), 2)}
+        for product, total in zip(ranked["product"], ranked[measure])
+    ]
+    return _spec(
+        title,
+        values,
+        mark="bar",
+        encoding={
+            "x": {"field": "product", "type": "nominal", "sort": None, "title": "Product", "axis": {"labelAngle": -45}},
+            "y": {"field": measure, "type": "quantitative", "title": ylabel},
+            "tooltip": [{"field": "product"}, {"field": measure, "type": "quantitative", "title": ylabel}],
+        },
+    )
+
+
+def _spec(title, values, **spec):
+    # Sized by the output container, like the server-rendered images
+    return {
+        "$schema": SCHEMA,
+        "title": title,
+        "width": "container",
+        "height": "container",
+        "autosize": {"type": "fit", "contains": "padding"},
+        "data": {"values": values},
+        **spec,
+    }
@@ -0,0 +1,57 @@
+# vendor.py
+"""Copy the pinned Vega builds into www/vendor for ``SALES_CHART_MODE=client``.
+
+    python -m sales_data.vendor [--force]
+
+The browser loads vega, vega-lite and vega-embed from the app itself, so
+client mode works offline and behind proxies. The builds are committed;
+run this with network access after changing a version below and commit
+the downloaded files. Without them client mode falls back to server
+charts. The libraries are BSD-3-Clause, see www/vendor/LICENSE.
+"""
+import argparse
+import logging
+import urllib.request
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+VENDOR_DIR = Path(__file__).parent / "www" / "vendor"
+CDN = "https://cdn.jsdelivr.net/npm"
+
+# (package, version, script); each is served from VENDOR_DIR / package
+LIBRARIES = (
+    ("vega", "5.30.0", "vega.min.js"),
+    ("vega-lite", "5.21.0", "vega-lite.min.js"),
+    ("vega-embed", "6.26.0", "vega-embed.min.js"),
+)
+
+
+def missing():
+    """Scripts of ``LIBRARIES`` not yet in ``VENDOR_DIR``."""
+    return [VENDOR_DIR / name / script for name, _, script in LIBRARIES if not (VENDOR_DIR / name / script).exists()]
+
+
+def fetch(force=False):
+    """Download each library's build into ``VENDOR_DIR`` unless present."""
+    for name, version, script in LIBRARIES:
+        target = VENDOR_DIR / name / script
+        if target.exists() and not force:
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        url = f"{CDN}/{name}@{version}/build/{script}"
+        with urllib.request.urlopen(url, timeout=60) as response:
+            target.write_bytes(response.read())
+        logger.info("Fetched %s to %s", url, target)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--force", action="store_true", help="download even the files already present")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    fetch(args.force)
+
+
+if __name__ == "__main__":
+    main()
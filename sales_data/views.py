@@ -0,0 +1,155 @@
+# views.py
+"""Per-session reactive views onto the shared store."""
+import asyncio
+from typing import NamedTuple, Optional
+
+import pandas as pd
+from shiny import reactive, req, ui
+
+from .instrument import carry_cause, timed
+from .sessions import SESSIONS
+from .store import STORE
+from .warmup import WARMUP
+
+
+class CityView(NamedTuple):
+    city: str
+    snapshot: object
+    # (first day, last day) as timestamps, or None for every date
+    dates: Optional[tuple] = None
+
+    @property
+    def version(self):
+        """Data version of this city's rows; use it in cache keys."""
+        return self.snapshot.city_version(self.city)
+
+    @property
+    def key(self):
+        """What per-city outputs depend on: city, its data version and dates."""
+        return self.city, self.version, self.dates
+
+    @property
+    def nbytes(self):
+        """Bytes of an older snapshot this view keeps alive once the store
+        has moved on; the current one is shared and counts nothing."""
+        return 0 if self.snapshot is STORE.current() else self.snapshot.nbytes
+
+
+def snapshot_poll():
+    """Reactive calc of the store's current ``Snapshot``, once its shared
+    artifacts are built.
+
+    The snapshot is shared across sessions and the calc is invalidated only
+    when the data changes. A new snapshot's artifacts are built on a worker
+    thread, so a reload doesn't block the event loop; meanwhile the outputs
+    show as busy. Create one per session, in the server function, and pass
+    it to everything that reads the data.
+    """
+    @reactive.poll(STORE.version, 1)
+    @timed
+    def latest():
+        return STORE.snapshot()
+
+    @reactive.extended_task
+    async def prepare(snap):
+        await asyncio.to_thread(snap.prepare)
+        return snap
+
+    @reactive.effect(priority=1)
+    def _():
+        snap = latest()
+        carry_cause()
+        # A superseded snapshot's thread finishes in the background
+        prepare.cancel()
+        prepare.invoke(snap)
+
+    @reactive.calc
+    @timed
+    def snapshot():
+        return prepare.result()
+
+    return snapshot
+
+
+def date_window(snapshot, value):
+    """The date slider's ``value`` as a ``dates`` window, or None when it
+    covers every date the snapshot has (so the full-range artifacts apply)."""
+    if not value:
+        return None
+    start, end = (pd.Timestamp(day) for day in value)
+    first, last = snapshot.date_bounds
+    if start <= first and end >= last:
+        return None
+    return start, end
+
+
+def date_range_input(id, snapshot, label="Order dates:"):
+    """Date range slider spanning ``snapshot``'s orders, for ``date_window``.
+
+    Pair it with ``date_range_server`` so its range follows the data.
+    """
+    first, last = (day.date() for day in snapshot.date_bounds)
+    return ui.input_slider(id, label, min=first, max=last, value=(first, last), time_format="%Y-%m-%d")
+
+
+def date_range_server(id, value, snapshot):
+    """Keep the ``id`` slider from ``date_range_input`` spanning the orders
+    of the session's ``snapshot`` as data arrives or is reloaded.
+
+    ``value`` is the slider's input. A selection that reached an end of the
+    old range is stretched to the new end, so the days that arrive are
+    selected too; the rest is kept within the new range.
+    """
+    bounds = reactive.value(None)
+
+    @reactive.effect
+    def _():
+        first, last = (day.date() for day in snapshot().date_bounds)
+        with reactive.isolate():
+            start, end = (pd.Timestamp(day).date() for day in value())
+            # A new session's slider spans the range it was rendered with
+            previous = bounds.get() or (start, end)
+        bounds.set((first, last))
+        if previous == (first, last):
+            return
+        start = first if start <= previous[0] else min(max(start, first), last)
+        end = last if end >= previous[1] else max(min(end, last), start)
+        ui.update_slider(id, min=first, max=last, value=(start, end))
+
+
+def city_view(snapshot, city, dates=None):
+    """Reactive ``CityView`` for the city chosen by the ``city`` input and
+    the window chosen by the optional ``dates`` input (a date range slider).
+
+    ``snapshot`` is the session's ``snapshot_poll`` calc, so the shared
+    artifacts are built by the time the view is. A new view is published
+    only when its ``key`` changes: rows appended for other cities leave the
+    view, and so every per-city output, as it was. The view then holds on
+    to its older snapshot until the city's rows or the window change
+    (``CityView.nbytes`` counts it). Per-city outputs should read the city
+    from the view rather than from the input.
+    """
+    current = reactive.value(None)
+
+    @reactive.effect
+    @reactive.event(city)
+    def _():
+        # Popular cities are warmed first after the next restart
+        WARMUP.record_selection(city())
+
+    @reactive.effect(priority=1)
+    def _():
+        snap = snapshot()
+        window = date_window(snap, dates()) if dates is not None else None
+        view = CityView(city(), snap, window)
+        with reactive.isolate():
+            previous = current.get()
+        if previous is None or previous.key != view.key:
+            current.set(view)
+
+    @reactive.calc
+    @timed
+    def view():
+        return SESSIONS.track("view", req(current()))
+
+    return view
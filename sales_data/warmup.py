@@ -0,0 +1,195 @@
+# warmup.py
+"""Background warm-up of per-city results once the data has loaded.
+
+A low-priority thread goes through every city, most often selected first,
+and fills the shared caches the way a session choosing that city would:
+the shared artifacts, the city's full-range cube results (totals, insights,
+monthly and hourly rollups) and its cached chart images. New data versions
+are warmed the same way, skipping cities whose rows didn't change.
+
+Selection counts and the chart sizes browsers asked for are kept in
+``warmup.json`` next to the sales cache, so after a restart the warm-up
+follows the last run's traffic. Until a size has been seen, charts are
+rendered at ``plot_cache.DEFAULT_SIZE``.
+
+Set ``SALES_WARMUP=0`` to turn it off.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from . import charts, vega
+from .cache import cache_dir, write_json
+from .plot_cache import DEFAULT_SIZE, PLOT_CACHE
+from .rendering import RENDER_POOL, render_png
+from .store import STORE
+
+ENABLED = os.environ.get("SALES_WARMUP", "1") != "0"
+# Seconds to yield between steps, and while sessions are rendering
+PAUSE = float(os.environ.get("SALES_WARMUP_PAUSE", "0.05"))
+# Chart sizes remembered per output
+MAX_SIZES = 3
+
+logger = logging.getLogger(__name__)
+
+
+def monthly_chart(snapshot, city):
+    """Draw function of a city's ``charts.monthly_orders`` output."""
+    monthly = snapshot.cube.by_month(city)
+    return lambda fig: charts.monthly_orders(fig, monthly, city)
+
+
+def hourly_chart(snapshot, city):
+    """Draw function of a city's ``charts.hourly_orders`` output."""
+    counts = snapshot.cube.by_hour(city)["orders"]
+    return lambda fig: charts.hourly_orders(fig, counts, city)
+
+
+class WarmUp:
+    """Warms the caches for every city of the current snapshot, in order of
+    popularity, on one background thread.
+
+    Charts are registered per output id with a ``build(snapshot, city)``
+    returning the draw function the output would pass to ``cached_plot``;
+    the output's cache key must be ``(output id, *CityView.key)``.
+    """
+
+    def __init__(self, store=STORE, state_path=None):
+        self.store = store
+        self.state_path = state_path or cache_dir(store.path) / "warmup.json"
+        self.charts = {}
+        self.popularity = Counter()
+        self.sizes = {}
+        self._warmed = {}
+        self._progress = {"version": None, "done": 0, "total": 0, "city": None, "seconds": 0.0}
+        self._saved = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._load_state()
+
+    def start(self, charts=None):
+        """Register ``charts`` (output id -> build) and start the thread once."""
+        with self._lock:
+            # Charts drawn in the browser leave no images to warm
+            if not vega.CLIENT:
+                self.charts.update(charts or {})
+            if self._thread is not None or not ENABLED:
+                return
+            self._thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def record_selection(self, city):
+        """Count a session choosing ``city``."""
+        with self._lock:
+            self.popularity[city] += 1
+
+    def progress(self):
+        """``{"version", "done", "total", "city", "seconds"}`` of the latest pass;
+        ``city`` is the one being warmed, or None when the pass is over."""
+        with self._lock:
+            return dict(self._progress)
+
+    def ranked(self, cities):
+        """``cities`` most often selected first; ties keep their order."""
+        with self._lock:
+            counts = dict(self.popularity)
+        return sorted(cities, key=lambda city: -counts.get(city, 0))
+
+    def _run(self):
+        _lower_priority()
+        while True:
+            try:
+                snap = self.store.snapshot()
+                if snap.version != self._progress["version"]:
+                    self._warm(snap)
+                self._save_state()
+            except Exception:
+                logger.exception("Warm-up failed")
+            time.sleep(self.store.check_interval)
+
+    def _warm(self, snap):
+        cities = self.ranked(snap.city_index.cities)
+        started = time.perf_counter()
+        self._update(version=snap.version, done=0, total=len(cities), city=None, seconds=0.0)
+        for done, city in enumerate(cities):
+            if self.store.snapshot() is not snap:
+                # Newer data arrived; the next pass starts from the top
+                return
+            self._update(city=city)
+            version = snap.city_version(city)
+            if self._warmed.get(city) != version:
+                self.warm_city(snap, city)
+                self._warmed[city] = version
+            self._update(done=done + 1, seconds=time.perf_counter() - started)
+        self._update(city=None)
+        logger.info(
+            "Warmed %d cities for version %d in %.1fs", len(cities), snap.version, time.perf_counter() - started
+        )
+
+    def warm_city(self, snap, city):
+        """Fill the shared caches for ``city`` as a session would."""
+        snap.prepare()
+        snap.cube.totals(city)
+        snap.cube.insights(city)
+        for name, build in list(self.charts.items()):
+            for size in self._chart_sizes(name):
+                key = (name, city, snap.city_version(city), None, *size)
+                if key in PLOT_CACHE:
+                    continue
+                self._yield()
+                PLOT_CACHE.put(key, render_png(build(snap, city), *size))
+
+    def _chart_sizes(self, name):
+        sizes = dict.fromkeys(tuple(size) for size in self.sizes.get(name, ()))
+        sizes.update(dict.fromkeys(PLOT_CACHE.sizes(name)))
+        sizes = list(sizes)[-MAX_SIZES:]
+        self.sizes[name] = sizes
+        return sizes or [(*DEFAULT_SIZE, 1)]
+
+    def _yield(self):
+        # Sessions' own renders go first
+        time.sleep(PAUSE)
+        while RENDER_POOL.stats()["queued"]:
+            time.sleep(PAUSE)
+
+    def _update(self, **progress):
+        with self._lock:
+            self._progress.update(progress)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.popularity.update(state.get("popularity", {}))
+        self.sizes = {name: [tuple(size) for size in sizes] for name, sizes in state.get("sizes", {}).items()}
+
+    def _save_state(self):
+        for name in list(self.charts):
+            self._chart_sizes(name)
+        sizes = {name: [list(size) for size in sizes] for name, sizes in self.sizes.items()}
+        with self._lock:
+            state = {"popularity": dict(self.popularity), "sizes": sizes}
+        if state == self._saved:
+            return
+        try:
+            self.state_path.parent.mkdir(parents=True, exist_ok=True)
+            write_json(self.state_path, state)
+            self._saved = state
+        except OSError as e:
+            logger.warning("Could not save warm-up state to %s: %s", self.state_path, e)
+
+
+def _lower_priority():
+    """Lower the calling thread's CPU priority where the OS allows it."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 10)
+    except (AttributeError, OSError):
+        pass
+
+
+WARMUP = WarmUp()
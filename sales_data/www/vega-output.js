@@ -0,0 +1,47 @@
+// vega-output.js
+// Shiny output binding for render_vega: draws the Vega-Lite spec sent by
+// the server into a .sales-vega-output container.
+(function () {
+  var binding = new Shiny.OutputBinding();
+
+  $.extend(binding, {
+    find: function (scope) {
+      return $(scope).find(".sales-vega-output");
+    },
+
+    renderValue: function (el, spec) {
+      if (el._salesView) {
+        el._salesView.finalize();
+        el._salesView = null;
+      }
+      if (!spec) {
+        el.innerHTML = "";
+        return;
+      }
+      // A newer spec may arrive before this one is drawn; keep only the latest
+      var token = (el._salesToken || 0) + 1;
+      el._salesToken = token;
+      vegaEmbed(el, spec, { actions: false }).then(function (result) {
+        if (el._salesToken === token) {
+          el._salesView = result.view;
+        } else {
+          result.finalize();
+        }
+      }).catch(function (err) {
+        if (el._salesToken === token) {
+          el.textContent = err.message || String(err);
+        }
+      });
+    },
+
+    renderError: function (el, err) {
+      el.textContent = err.message;
+    },
+
+    clearError: function (el) {
+      el.textContent = "";
+    }
+  });
+
+  Shiny.outputBindings.register(binding, "sales.vegaOutput");
+})();
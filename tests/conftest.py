@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_data import synthetic
+
+
+def append_orders(path, rows, seed=1, **columns):
+    """Append ``rows`` synthetic orders to the CSV at ``path``; ``columns``
+    overrides whole columns, e.g. ``city="Denver (CO)"``."""
+    chunk = synthetic.generate_chunk(rows, np.random.default_rng(seed), days=60).assign(**columns)
+    with open(path, "a", newline="") as f:
+        chunk.to_csv(f, header=False, index=False)
+    return chunk
+
+
+def plain(data):
+    """``data`` with categorical columns and index levels as strings, sorted,
+    as merged and freshly loaded categories may be ordered differently."""
+    if isinstance(data.index, pd.MultiIndex):
+        data.index = pd.MultiIndex.from_arrays([
+            level.astype(str) if isinstance(level.dtype, pd.CategoricalDtype) else level
+            for level in (data.index.get_level_values(i) for i in range(data.index.nlevels))
+        ])
+        return data.sort_index()
+    return data.astype({c: str for c in data.columns if isinstance(data[c].dtype, pd.CategoricalDtype)})
+
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    return synthetic.generate(tmp_path / "sales.csv", 2_000, days=60)
@@ -0,0 +1,77 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from sales_data import artifact
+from sales_data.cache import MANIFEST, read_manifest
+from sales_data.store import SalesStore
+
+from conftest import append_orders, plain
+
+CITY = "Boston (MA)"
+
+
+@pytest.fixture
+def memory(sales_csv):
+    return SalesStore(sales_csv, mode="memory").snapshot()
+
+
+def test_build_load_round_trip(memory, tmp_path):
+    manifest = artifact.build_snapshot(memory, tmp_path, sample_rows=100)
+    loaded, artifacts, sample = artifact.load_snapshot(tmp_path)
+
+    assert loaded == manifest == read_manifest(tmp_path)
+    assert manifest["version"] == 1
+    tm.assert_frame_equal(plain(artifacts["cube"].table.copy()), plain(memory.cube.table.copy()))
+    tm.assert_frame_equal(
+        plain(artifacts["product_ranking"].daily.copy()), plain(memory.product_ranking.daily.copy())
+    )
+    bins = artifacts["spatial_bins"]
+    for cell, table in memory.spatial_bins.levels.items():
+        tm.assert_series_equal(plain(bins.levels[cell].copy()), plain(table.copy()))
+    for cell, table in memory.spatial_bins.daily.items():
+        tm.assert_series_equal(plain(bins.daily[cell].copy()), plain(table.copy()))
+    assert artifacts["city_index"].counts() == memory.city_index.counts()
+    assert artifacts["cube"].insights(CITY) == pytest.approx(memory.cube.insights(CITY))
+    assert abs(len(sample) - 100) <= len(manifest["cities"])
+
+
+def test_rebuild_keeps_the_previous_snapshot(memory, tmp_path):
+    for _ in range(3):
+        manifest = artifact.build_snapshot(memory, tmp_path)
+
+    assert manifest["version"] == 3
+    kept = sorted(path.name for path in tmp_path.glob("snapshot-*"))
+    assert kept == ["snapshot-000002", "snapshot-000003"]
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_aggregate_mode_serves_the_dashboards(memory, sales_csv):
+    artifact.build_snapshot(memory, artifact.snapshot_dir(sales_csv), sales_csv)
+    store = SalesStore(sales_csv, mode="aggregate")
+    snap = store.snapshot()
+    first, _ = memory.date_bounds
+    dates = (first + pd.Timedelta(days=10), first + pd.Timedelta(days=40))
+
+    assert store.watched.name == MANIFEST
+    assert snap.frame is None
+    assert snap.cube.totals(CITY) == pytest.approx(memory.cube.totals(CITY))
+    tm.assert_frame_equal(snap.cube.by_month(CITY, dates), memory.cube.by_month(CITY, dates))
+    assert snap.product_ranking.top("value", 5).equals(memory.product_ranking.top("value", 5))
+    # Without a sample the grid streams the raw rows
+    rows = snap.city_rows(CITY)
+    tm.assert_frame_equal(rows.iloc[:], memory.city_rows(CITY).reset_index(drop=True))
+
+
+def test_aggregate_mode_picks_up_a_new_build(memory, sales_csv):
+    directory = artifact.snapshot_dir(sales_csv)
+    artifact.build_snapshot(memory, directory, sales_csv)
+    store = SalesStore(sales_csv, mode="aggregate")
+    before = store.snapshot()
+
+    append_orders(sales_csv, 20, city=CITY)
+    artifact.build_snapshot(SalesStore(sales_csv, mode="memory").snapshot(), directory, sales_csv)
+    after = store.refresh()
+
+    assert after.version == before.version + 1
+    assert after.cube.totals(CITY)[2] == before.cube.totals(CITY)[2] + 20
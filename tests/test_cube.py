@@ -0,0 +1,24 @@
+import pandas as pd
+
+from sales_data.store import SalesStore
+
+
+def test_insights_of_an_empty_window(sales_csv):
+    cube = SalesStore(sales_csv, mode="memory").snapshot().cube
+    _, last = cube.date_bounds
+    dates = (last + pd.Timedelta(days=1), last + pd.Timedelta(days=5))
+
+    insights = cube.insights("Boston (MA)", dates)
+
+    assert insights == {"best_month": None, "worst_month": None, "peak_hour": None, "total_sales": 0.0}
+    assert cube.totals("Boston (MA)", dates) == (0, 0, 0)
+
+
+def test_insights_match_the_rollups(sales_csv):
+    cube = SalesStore(sales_csv, mode="memory").snapshot().cube
+
+    insights = cube.insights("Boston (MA)")
+
+    monthly = cube.by_month("Boston (MA)").set_index("month_name")["value"]
+    assert insights["best_month"] == monthly.idxmax()
+    assert insights["peak_hour"] == cube.by_hour("Boston (MA)")["quantity_ordered"].idxmax()
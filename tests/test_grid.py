@@ -0,0 +1,107 @@
+import asyncio
+from collections import Counter
+
+import pytest
+from shiny import App, reactive, ui
+from shiny._connection import MockConnection
+from shiny.module import ResolvedId
+from shiny.reactive import flush
+from shiny.session._session import AppSession, session_context
+
+from sales_data import grid
+from sales_data.grid import grid_server
+from sales_data.sessions import SESSIONS
+from sales_data.store import SalesStore
+from sales_data.views import city_view
+
+from conftest import append_orders
+
+INPUTS = {"sort": "value", "descending": False, "product": "", "min_value": None, "page_size": "25",
+          "previous": None, "next": None}
+
+
+@pytest.fixture
+def store(sales_csv):
+    return SalesStore(sales_csv, mode="memory")
+
+
+async def settle():
+    # Sort orders are built on a worker thread
+    for _ in range(20):
+        await flush()
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Sort orders built, per city."""
+    builds = Counter()
+    build = grid.RowOrder.build
+
+    def counted(snap, city, *args):
+        builds[city] += 1
+        return build(snap, city, *args)
+
+    monkeypatch.setattr(grid.RowOrder, "build", counted)
+    return builds
+
+
+def grid_session(session_id, snapshot, **overrides):
+    """A session running the Boston grid; returns it and its inputs."""
+    session = AppSession(App(ui.page_fluid(), None), session_id, MockConnection())
+    inputs = {ResolvedId(f"grid-{name}"): reactive.value(value) for name, value in {**INPUTS, **overrides}.items()}
+    for output in ("rows", "status"):
+        inputs[ResolvedId(f".clientdata_output_grid-{output}_hidden")] = reactive.value(False)
+    for name, value in inputs.items():
+        session.input[name] = value
+    with session_context(session):
+        grid_server("grid", city_view(snapshot, reactive.value("Boston (MA)")))
+    return session, inputs
+
+
+def test_appends_to_other_cities_leave_the_grid_alone(store, sales_csv, builds):
+    async def main():
+        snapshot = reactive.value(store.snapshot())
+        session, inputs = grid_session("appends", snapshot)
+        values = session._outbound_message_queues.values
+
+        await settle()
+        inputs[ResolvedId("grid-next")].set(1)
+        await settle()
+        assert values["grid-status"].startswith("Page 2 of")
+        status = values.pop("grid-status")
+
+        append_orders(sales_csv, 20, city="Dallas (TX)")
+        snapshot.set(store.refresh())
+        await settle()
+        assert builds == {"Boston (MA)": 1}
+        assert "grid-status" not in values
+
+        append_orders(sales_csv, 20, city="Boston (MA)", seed=2)
+        snapshot.set(store.refresh())
+        await settle()
+        assert builds == {"Boston (MA)": 2}
+        assert values["grid-status"] != status
+
+    asyncio.run(main())
+
+
+def test_released_orders_are_rebuilt_on_the_same_page(store, builds):
+    async def main():
+        session, inputs = grid_session("released", reactive.value(store.snapshot()), min_value=10)
+        values = session._outbound_message_queues.values
+
+        await settle()
+        inputs[ResolvedId("grid-next")].set(1)
+        await settle()
+        second = values["grid-rows"]
+        assert SESSIONS._sessions["released"].release() > 0
+
+        inputs[ResolvedId("grid-next")].set(2)
+        await settle()
+        assert builds == {"Boston (MA)": 2}
+        assert values["grid-status"].startswith("Page 3 of")
+        assert values["grid-rows"] != second
+        assert not SESSIONS._sessions["released"].results["grid-order"].released
+
+    asyncio.run(main())
@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+
+from sales_data import instrument
+
+
+def session(search):
+    return SimpleNamespace(clientdata=SimpleNamespace(url_search=lambda: search))
+
+
+def test_admin_needs_the_token(monkeypatch):
+    monkeypatch.setattr(instrument, "ADMIN_TOKEN", "s3cret")
+
+    assert instrument.is_admin(session("?admin=s3cret"))
+    assert instrument.is_admin(session("?city=Boston&admin=s3cret"))
+    assert not instrument.is_admin(session("?admin=1"))
+    assert not instrument.is_admin(session(""))
+
+
+def test_no_token_means_no_admin(monkeypatch):
+    monkeypatch.setattr(instrument, "ADMIN_TOKEN", "")
+
+    assert not instrument.is_admin(session("?admin="))
+    assert not instrument.is_admin(session("?admin=1"))
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from sales_data.paging import RowOrder, SortOrders, sort_order
+from sales_data.store import SalesStore
+
+from conftest import append_orders
+
+
+@pytest.fixture
+def store(sales_csv):
+    return SalesStore(sales_csv, mode="memory")
+
+
+def test_sort_order_is_int32_and_stable(store):
+    snap = store.snapshot()
+    rows = snap.city_rows("Boston (MA)")
+
+    positions = sort_order(snap, "Boston (MA)", "value")
+
+    assert positions.dtype == np.int32
+    expected = rows.reset_index(drop=True)["value"].sort_values(kind="stable").index.to_numpy()
+    np.testing.assert_array_equal(positions, expected)
+
+
+def test_sort_orders_keep_the_most_recent():
+    orders = SortOrders(size=2)
+    built = []
+
+    def build(key):
+        def build():
+            built.append(key)
+            return np.zeros(3, dtype=np.int32)
+        return build
+
+    for key in ("a", "b", "a", "c", "a", "b"):
+        orders.get(key, build(key))
+
+    assert built == ["a", "b", "c", "b"]
+    assert orders.nbytes == 24
+
+
+def test_sort_orders_survive_appends_to_other_cities(store, sales_csv):
+    before = store.snapshot()
+    boston = sort_order(before, "Boston (MA)", "value")
+    dallas = sort_order(before, "Dallas (TX)", "value")
+    append_orders(sales_csv, 20, city="Dallas (TX)")
+
+    after = store.refresh()
+
+    assert sort_order(after, "Boston (MA)", "value") is boston
+    assert len(sort_order(after, "Dallas (TX)", "value")) == len(dallas) + 20
+
+
+def test_row_order_pages(store):
+    snap = store.snapshot()
+    rows = snap.city_rows("Boston (MA)")
+
+    order = RowOrder.build(snap, "Boston (MA)", sort="value", descending=True, filters={"value": (100, None)})
+    page = order.page(0, 25)
+
+    assert len(order) == int((rows["value"] >= 100).sum())
+    assert page["value"].is_monotonic_decreasing
+    assert page["value"].iloc[0] == rows["value"].max()
+
+
+def test_row_order_counts_only_what_it_owns(store):
+    snap = store.snapshot()
+
+    shared = RowOrder.build(snap, "Boston (MA)", sort="value", descending=True)
+    filtered = RowOrder.build(snap, "Boston (MA)", sort="value", filters={"value": (100, None)})
+
+    assert shared.nbytes == 0
+    assert filtered.nbytes == filtered.positions.nbytes > 0
+    length = len(filtered)
+    filtered.release()
+    assert filtered.nbytes == 0
+    assert len(filtered) == length
+    with pytest.raises(RuntimeError):
+        filtered.page(0, 25)
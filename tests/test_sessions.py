@@ -0,0 +1,64 @@
+import pytest
+
+from sales_data.paging import RowOrder
+from sales_data.sessions import SessionRegistry, SessionState
+from sales_data.store import SalesStore
+
+CITY = "Boston (MA)"
+
+
+@pytest.fixture
+def store(sales_csv):
+    return SalesStore(sales_csv, mode="memory")
+
+
+def registry(store, last_active, **kwargs):
+    """A registry with one session per ``last_active`` time, each holding a
+    filtered grid order (owned positions) and a shared one."""
+    snap = store.snapshot()
+    registry = SessionRegistry(**kwargs)
+    for i, active in enumerate(last_active):
+        registry._sessions[str(i)] = SessionState(str(i), started=0, last_active=active, results={
+            "grid-order": RowOrder.build(snap, CITY, "value", False, {"value": (10, None)}),
+            "grid-shared": RowOrder.build(snap, CITY, "value", False, {}),
+        })
+    return registry
+
+
+def orders(registry, name="grid-order"):
+    return [registry._sessions[str(i)].results[name] for i in range(len(registry._sessions))]
+
+
+def test_sweep_releases_idle_sessions(store):
+    sessions = registry(store, [0, 50, 100], idle_seconds=60, max_bytes=1 << 40)
+    held = [order.nbytes for order in orders(sessions)]
+
+    freed = sessions.sweep(now=120)
+
+    assert freed == held[0] + held[1] == sessions.released_bytes
+    assert [order.released for order in orders(sessions)] == [True, True, False]
+    # Shared orders own nothing, so releasing them frees nothing
+    assert not any(order.released for order in orders(sessions, "grid-shared"))
+    assert [sessions._sessions[str(i)].releases for i in range(3)] == [1, 1, 0]
+    assert sessions.sweep(now=120) == 0
+
+
+def test_sweep_releases_least_recent_sessions_over_the_cap(store):
+    sessions = registry(store, [20, 0, 10], idle_seconds=3600, max_bytes=1)
+
+    freed = sessions.sweep(now=30)
+
+    # Over the cap down to the most recent session, which is kept
+    assert [order.released for order in orders(sessions)] == [False, True, True]
+    assert freed == sessions.released_bytes > 0
+    assert sessions.stats()["bytes"] == orders(sessions)[0].nbytes > 0
+
+
+def test_sweep_stops_once_under_the_cap(store):
+    sessions = registry(store, [20, 0, 10], idle_seconds=3600, max_bytes=1 << 40)
+    one = orders(sessions)[0].nbytes
+    sessions.max_bytes = 2 * one
+
+    sessions.sweep(now=30)
+
+    assert [order.released for order in orders(sessions)] == [False, True, False]
@@ -0,0 +1,14 @@
+from sales_data import shared
+from sales_data.store import SalesStore
+
+
+def test_publish_keeps_the_previous_publication(sales_csv, tmp_path):
+    frame = SalesStore(sales_csv, mode="memory").snapshot().frame
+    directory = tmp_path / "published"
+    for version in (1, 2, 3):
+        shared.publish(frame, directory, version)
+
+    assert sorted(p.name for p in directory.glob("sales-*.arrow")) == ["sales-000002.arrow", "sales-000003.arrow"]
+    manifest, attached = shared.attach(directory)
+    assert manifest["version"] == 3
+    assert len(attached) == len(frame)
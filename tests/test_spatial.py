@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+from sales_data.artifact import build_snapshot, snapshot_dir
+from sales_data.store import SalesStore
+
+from conftest import append_orders
+
+
+def test_points_use_the_finest_level_that_fits(sales_csv):
+    bins = SalesStore(sales_csv, mode="memory").snapshot().spatial_bins
+    finest = len(bins._select(0.01, "Boston (MA)"))
+    coarse = len(bins._select(0.05, "Boston (MA)"))
+
+    assert len(bins.points("Boston (MA)")) == finest
+    assert len(bins.points("Boston (MA)", max_cells=finest - 1)) == coarse
+    assert len(bins.points("Boston (MA)", max_cells=0)) == len(bins._select(1.0, "Boston (MA)"))
+
+
+def test_points_keep_the_total_quantity(sales_csv):
+    snap = SalesStore(sales_csv, mode="memory").snapshot()
+
+    points = snap.spatial_points("Boston (MA)")
+
+    assert points[:, 2].sum() == snap.city_rows("Boston (MA)")["quantity_ordered"].sum()
+
+
+def window(snap, days):
+    first, _ = snap.date_bounds
+    return first + pd.Timedelta(days=days[0]), first + pd.Timedelta(days=days[1])
+
+
+def test_windowed_points_keep_the_window_quantity(sales_csv):
+    snap = SalesStore(sales_csv, mode="memory").snapshot()
+    dates = window(snap, (10, 40))
+
+    points = snap.spatial_points("Boston (MA)", dates)
+
+    assert points[:, 2].sum() == snap.city_rows("Boston (MA)", dates)["quantity_ordered"].sum()
+    assert snap.spatial_points("Nowhere", dates).shape == (0, 3)
+
+
+def test_aggregate_mode_windows_match_memory_mode(sales_csv):
+    memory = SalesStore(sales_csv, mode="memory").snapshot()
+    build_snapshot(memory, snapshot_dir(sales_csv), sales_csv)
+    aggregate = SalesStore(sales_csv, mode="aggregate").snapshot()
+    dates = window(memory, (10, 40))
+
+    assert aggregate.spatial_windows
+    np.testing.assert_array_equal(
+        aggregate.spatial_points("Boston (MA)", dates), memory.spatial_points("Boston (MA)", dates)
+    )
+
+
+def test_bins_without_daily_sums_show_every_date(sales_csv):
+    snap = SalesStore(sales_csv, mode="memory").snapshot()
+    snap.spatial_bins.daily = None
+
+    assert not snap.spatial_windows
+    np.testing.assert_array_equal(
+        snap.spatial_points("Boston (MA)", window(snap, (10, 40))), snap.spatial_points("Boston (MA)")
+    )
+
+
+def test_windowed_points_are_shared_until_the_city_changes(sales_csv):
+    store = SalesStore(sales_csv, mode="memory")
+    before = store.snapshot()
+    dates = window(before, (10, 40))
+    points = before.spatial_points("Boston (MA)", dates)
+    assert before.spatial_points("Boston (MA)", dates) is points
+
+    append_orders(sales_csv, 20, city="Dallas (TX)")
+    after = store.refresh()
+    assert after.spatial_points("Boston (MA)", dates) is points
+
+    append_orders(sales_csv, 20, city="Boston (MA)", seed=2)
+    assert store.refresh().spatial_points("Boston (MA)", dates) is not points
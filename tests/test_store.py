@@ -0,0 +1,95 @@
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from sales_data.store import SalesStore
+
+from conftest import append_orders, plain
+
+MODES = ["memory", "stream"]
+
+
+def city_rows(snap):
+    return {city: snap.city_rows(city).iloc[:].reset_index(drop=True) for city in snap.city_index.cities}
+
+
+def assert_same_data(appended, loaded):
+    tm.assert_frame_equal(plain(appended.cube.table.copy()), plain(loaded.cube.table.copy()))
+    tm.assert_frame_equal(plain(appended.product_ranking.daily.copy()), plain(loaded.product_ranking.daily.copy()))
+    for cell, table in loaded.spatial_bins.levels.items():
+        tm.assert_series_equal(plain(appended.spatial_bins.levels[cell].copy()), plain(table.copy()))
+    for cell, table in loaded.spatial_bins.daily.items():
+        tm.assert_series_equal(plain(appended.spatial_bins.daily[cell].copy()), plain(table.copy()))
+    assert appended.city_index.counts() == loaded.city_index.counts()
+    assert appended.date_bounds == loaded.date_bounds
+    expected = city_rows(loaded)
+    for city, rows in city_rows(appended).items():
+        tm.assert_frame_equal(plain(rows), plain(expected[city]))
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_append_matches_full_load(sales_csv, mode):
+    store = SalesStore(sales_csv, mode=mode)
+    before = store.snapshot()
+    before.prepare()
+    append_orders(sales_csv, 300)
+
+    after = store.refresh()
+
+    assert after.version == before.version + 1
+    assert after.offset == sales_csv.stat().st_size
+    assert_same_data(after, SalesStore(sales_csv, mode=mode).snapshot())
+
+
+@pytest.mark.parametrize("mode", MODES)
+def test_append_aligns_new_categories(sales_csv, mode):
+    store = SalesStore(sales_csv, mode=mode)
+    store.snapshot().prepare()
+    append_orders(sales_csv, 50, city="Denver (CO)", product="Standing Desk")
+
+    after = store.refresh()
+
+    assert "Denver (CO)" in after.city_index.cities
+    assert after.city_rows("Denver (CO)")["state"].eq("CO").all()
+    assert after.cube.totals("Denver (CO)")[2] == 50
+    assert "Standing Desk" in after.product_ranking.totals.index
+    assert_same_data(after, SalesStore(sales_csv, mode=mode).snapshot())
+
+
+def test_append_bumps_only_touched_cities(sales_csv):
+    store = SalesStore(sales_csv, mode="memory")
+    before = store.snapshot()
+    append_orders(sales_csv, 20, city="Boston (MA)")
+
+    after = store.refresh()
+
+    assert after.city_version("Boston (MA)") == after.version
+    assert after.city_version("Dallas (TX)") == before.city_version("Dallas (TX)")
+
+
+def test_incomplete_last_line_is_left_for_later(sales_csv):
+    store = SalesStore(sales_csv, mode="memory")
+    rows = len(store.snapshot().frame)
+    with open(sales_csv, "a") as f:
+        f.write("01/02/2019 10:00,Boston (MA),iPhone,1,700.0,42.3")
+
+    partial = store.refresh()
+    with open(sales_csv, "a") as f:
+        f.write(",-71.05\n")
+    complete = store.refresh()
+
+    assert len(partial.frame) == rows
+    assert len(complete.frame) == rows + 1
+    assert complete.frame["order_date"].max() >= pd.Timestamp("2019-02-01")
+
+
+def test_rewrite_reloads_in_full(sales_csv):
+    store = SalesStore(sales_csv, mode="memory")
+    before = store.snapshot()
+    text = sales_csv.read_text().splitlines(keepends=True)
+    sales_csv.write_text(text[0] + "".join(text[2:]))
+
+    after = store.refresh()
+
+    assert len(after.frame) == len(before.frame) - 1
+    assert after.base_version == after.version
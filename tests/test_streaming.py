@@ -0,0 +1,97 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pandas.testing as tm
+import pytest
+
+from sales_data import artifact, streaming
+from sales_data.paging import RowOrder
+from sales_data.store import SalesStore, Snapshot, read_sales_chunks
+
+CITY = "Boston (MA)"
+
+
+@pytest.fixture
+def snapshots(sales_csv, tmp_path):
+    """The same data loaded in memory and streamed in several chunks, so
+    a city's rows are not in date order on disk."""
+    files, artifacts = streaming.stream_sales(read_sales_chunks(sales_csv, chunk_rows=300), tmp_path / "rows")
+    streamed = Snapshot(1, None, (0, 0), rows=files, base_version=1)
+    streamed._derived.update(artifacts)
+    return SalesStore(sales_csv, mode="memory").snapshot(), streamed
+
+
+def test_city_rows_match_memory_mode(snapshots):
+    memory, streamed = snapshots
+
+    rows = streamed.city_rows(CITY)
+
+    assert rows.order is not None
+    expected = memory.city_rows(CITY).reset_index(drop=True)
+    tm.assert_frame_equal(rows.iloc[:], expected)
+    tm.assert_frame_equal(rows.iloc[[5, 0, 7]], expected.iloc[[5, 0, 7]].reset_index(drop=True))
+    tm.assert_series_equal(rows["product"], expected["product"])
+
+
+def test_date_window_matches_memory_mode(snapshots):
+    memory, streamed = snapshots
+    first, _ = memory.date_bounds
+    dates = (first + pd.Timedelta(days=10), first + pd.Timedelta(days=20))
+
+    tm.assert_frame_equal(
+        streamed.city_rows(CITY, dates).reset_index(drop=True),
+        memory.city_rows(CITY, dates).reset_index(drop=True),
+    )
+
+
+@pytest.mark.parametrize("sort", [None, "value", "product"])
+def test_grid_pages_match_memory_mode(snapshots, sort):
+    memory, streamed = snapshots
+    first, _ = memory.date_bounds
+    dates = (first + pd.Timedelta(days=5), first + pd.Timedelta(days=40))
+
+    pages = [
+        RowOrder.build(snap, CITY, sort, descending=True, filters={"value": (10, None)}, dates=dates).page(1, 25)
+        for snap in snapshots
+    ]
+
+    tm.assert_frame_equal(pages[1].reset_index(drop=True), pages[0].reset_index(drop=True))
+
+
+def test_prepare_reads_no_rows(snapshots):
+    _, streamed = snapshots
+
+    streamed.prepare()
+
+    assert not streamed.rows._cache
+
+
+def test_own_process_is_running():
+    assert streaming._running(os.getpid())
+
+
+def test_raw_rows_stream_once(sales_csv, tmp_path):
+    streams = []
+
+    def chunks():
+        streams.append(1)
+        return read_sales_chunks(sales_csv, chunk_rows=300)
+
+    rows = artifact.RawRows(chunks, tmp_path / "rows")
+    with ThreadPoolExecutor(4) as pool:
+        sizes = list(pool.map(lambda _: len(rows.city_rows(CITY)), range(8)))
+
+    assert streams == [1]
+    assert len(set(sizes)) == 1
+
+
+def test_evicted_city_rows_count_for_their_holders(snapshots, monkeypatch):
+    _, streamed = snapshots
+    monkeypatch.setattr(streaming, "CACHED_CITIES", 1)
+
+    order = RowOrder.build(streamed, CITY)
+    assert order.nbytes == 0
+    streamed.city_rows("Dallas (TX)")
+
+    assert order.nbytes == order.rows.order.nbytes > 0
@@ -0,0 +1,14 @@
+import pandas as pd
+import pytest
+
+from sales_data import synthetic
+
+
+@pytest.mark.parametrize("rows", [0, 1, 5])
+def test_generate_writes_rows_across_chunks(tmp_path, rows):
+    path = synthetic.generate(tmp_path / "sales.csv", rows, chunk_rows=2)
+
+    df = pd.read_csv(path)
+
+    assert len(df) == rows
+    assert list(df.columns) == ["order_date", "city", "product", "quantity_ordered", "price_each", "lat", "long"]
@@ -0,0 +1,119 @@
+import asyncio
+
+import pandas as pd
+import pytest
+from shiny import reactive
+from shiny.reactive import flush
+
+from sales_data.store import SalesStore
+from sales_data import views
+from sales_data.views import city_view, date_window
+
+from conftest import append_orders
+
+
+@pytest.fixture
+def store(sales_csv):
+    return SalesStore(sales_csv, mode="memory")
+
+
+def test_date_window_full_range_is_none(store):
+    snap = store.snapshot()
+    first, last = snap.date_bounds
+    assert date_window(snap, None) is None
+    assert date_window(snap, (first.date(), last.date())) is None
+    assert date_window(snap, (first - pd.Timedelta(days=3), last + pd.Timedelta(days=3))) is None
+
+
+def test_date_window_narrower_range(store):
+    snap = store.snapshot()
+    first, last = snap.date_bounds
+    assert date_window(snap, (first.date(), last.date() - pd.Timedelta(days=1))) == (first, last - pd.Timedelta(days=1))
+    assert date_window(snap, (first + pd.Timedelta(days=1), last)) == (first + pd.Timedelta(days=1), last)
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def settle():
+    # The city's artifacts are prepared on a worker thread
+    for _ in range(20):
+        await flush()
+        await asyncio.sleep(0.01)
+
+
+def test_city_view_invalidation(store, sales_csv):
+    async def main():
+        snapshot = reactive.value(store.snapshot())
+        city = reactive.value("Boston (MA)")
+        view = city_view(snapshot, city)
+        seen = []
+
+        @reactive.effect
+        def _():
+            seen.append(view())
+
+        await settle()
+        assert [v.city for v in seen] == ["Boston (MA)"]
+
+        # Rows for another city: the view stays as it was
+        append_orders(sales_csv, 20, city="Dallas (TX)")
+        snapshot.set(store.refresh())
+        await settle()
+        assert len(seen) == 1
+
+        # Rows for the city itself: a new key
+        append_orders(sales_csv, 20, city="Boston (MA)", seed=2)
+        current = store.refresh()
+        snapshot.set(current)
+        await settle()
+        assert seen[-1].version == current.version
+        assert seen[-1].key != seen[0].key
+
+        city.set("Dallas (TX)")
+        await settle()
+        assert seen[-1].city == "Dallas (TX)"
+
+    run(main())
+
+
+def test_date_range_follows_new_days(store, sales_csv, monkeypatch):
+    updates = []
+    monkeypatch.setattr(views.ui, "update_slider", lambda id, **kwargs: updates.append(kwargs))
+    first, last = (day.date() for day in store.snapshot().date_bounds)
+
+    async def main():
+        snapshot = reactive.value(store.snapshot())
+        dates = reactive.value((first, last))
+        views.date_range_server("dates", dates, snapshot)
+        await flush()
+        assert updates == []
+
+        append_orders(sales_csv, 5, city="Boston (MA)", order_date="15/03/2019 10:00")
+        current = store.refresh()
+        snapshot.set(current)
+        await flush()
+        new_last = current.date_bounds[1].date()
+        assert updates == [{"min": first, "max": new_last, "value": (first, new_last)}]
+
+        # A narrower selection stays as it was
+        dates.set((first, last - pd.Timedelta(days=3)))
+        append_orders(sales_csv, 5, city="Boston (MA)", order_date="20/03/2019 10:00", seed=2)
+        snapshot.set(store.refresh())
+        await flush()
+        assert updates[-1]["value"] == (first, last - pd.Timedelta(days=3))
+
+    run(main())
+
+
+def test_view_counts_only_a_replaced_snapshot(store, sales_csv, monkeypatch):
+    monkeypatch.setattr(views, "STORE", store)
+    before = store.snapshot()
+    view = views.CityView("Boston (MA)", before)
+    assert view.nbytes == 0
+
+    append_orders(sales_csv, 20)
+    store.refresh()
+
+    assert view.nbytes == before.nbytes > 0